@@ -0,0 +1,125 @@
+import argparse
+import glob
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import kakuro
+from kakuro_logic import Cell, Kakuro
+from engines import ENGINES, create_solver
+from kakuro_generator import generate_puzzle
+
+MAPS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'maps')
+SIZES = [6, 10, 14]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=1,
+                        help='Count of solutions for every puzzle')
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES),
+                        default=sorted(ENGINES), help='Solving engines')
+    parser.add_argument('--numSys', nargs='+', type=int, default=[10],
+                        help='Numeral systems of generated puzzles')
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES,
+                        help='Sizes of generated puzzles')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for generated puzzles')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Count of runs, the best time is reported')
+    parser.add_argument('--timeout', type=float, default=60,
+                        help='Time limit for one run in seconds')
+    parser.add_argument('--no-maps', action='store_true',
+                        help='Do not run puzzles from maps/')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Do not measure peak memory')
+    parser.add_argument('-o', '--output',
+                        help='Name of file for results (stdout by default)')
+    args = parser.parse_args()
+    output = sys.stdout
+    if args.output is not None:
+        output = open(args.output, 'w')
+    try:
+        for record in iter_records(args):
+            output.write(json.dumps(record, sort_keys=True) + '\n')
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def iter_records(args):
+    for name, data, is_torus, numeral_system in iter_puzzles(
+            args.numSys, args.sizes, args.seed, not args.no_maps):
+        for engine in args.engines:
+            yield run_case(name, data, is_torus, numeral_system, engine,
+                           args.n, args.timeout, args.repeat,
+                           not args.no_memory)
+
+
+def iter_puzzles(numeral_systems, sizes, seed=0, use_maps=True):
+    if use_maps and 10 in numeral_systems:
+        for filename in sorted(glob.glob(os.path.join(MAPS_DIR, '*.txt'))):
+            name = os.path.basename(filename)
+            yield name, kakuro.load_data(filename), 'Tor' in name, 10
+    for numeral_system in numeral_systems:
+        for size in sizes:
+            rng = random.Random('{0}-{1}-{2}'.format(seed, numeral_system,
+                                                     size))
+            name = 'generated-{0}x{0}-base{1}'.format(size, numeral_system)
+            yield (name, generate_puzzle(size, numeral_system, rng), False,
+                   numeral_system)
+
+
+def run_case(name, data, is_torus, numeral_system, engine, n=1,
+             time_limit=None, repeat=1, memory=True):
+    record = {'puzzle': name, 'engine': engine,
+              'numeral_system': numeral_system, 'torus': is_torus,
+              'python': platform.python_version()}
+    try:
+        kakuro_ = Kakuro(list(data), is_torus)
+    except ValueError as e:
+        record.update(status='invalid', error=str(e))
+        return record
+    record['size'] = '{0}x{1}'.format(kakuro_.width, kakuro_.height)
+    record['cells'] = sum(map(lambda x: isinstance(x, Cell),
+                              itertools.chain(*kakuro_.map_)))
+    best = None
+    for _ in range(max(repeat, 1)):
+        solver = create_solver(engine, numeral_system, time_limit=time_limit)
+        kakuro_ = Kakuro(list(data), is_torus)
+        start = time.perf_counter()
+        count = sum(1 for _ in solver.iter_solutions(kakuro_, n))
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    record.update(time=best, solutions=count, nodes=solver.stats.nodes,
+                  backtracks=solver.stats.backtracks,
+                  solutions_per_second=count / best if best else None,
+                  status='timeout' if solver.limit_exceeded else 'ok')
+    if memory:
+        record['peak_memory'] = measure_memory(data, is_torus,
+                                               numeral_system, engine, n,
+                                               time_limit)
+    return record
+
+
+def measure_memory(data, is_torus, numeral_system, engine, n=1,
+                   time_limit=None):
+    solver = create_solver(engine, numeral_system, time_limit=time_limit)
+    tracemalloc.start()
+    try:
+        kakuro_ = Kakuro(list(data), is_torus)
+        for _ in solver.iter_solutions(kakuro_, n):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+if __name__ == '__main__':
+    main()
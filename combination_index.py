@@ -0,0 +1,263 @@
+import atexit
+import functools
+import json
+import mmap
+import os
+import struct
+import sys
+import table_creator
+
+CACHE_DIR_VARIABLE = 'KAKURO_CACHE_DIR'
+DIGITS_CACHE_SIZE = 1 << 16
+MAX_STORED_COMBINATIONS = 1 << 12
+
+
+class CombinationIndex:
+    _indexes = {}
+
+    def __init__(self, numeral_system, combinations):
+        self.numeral_system = numeral_system
+        self.full_mask = (1 << numeral_system) - 2
+        self.combinations = combinations
+        self.masks = getattr(combinations, 'get_masks', None)
+
+    @staticmethod
+    def for_numeral_system(numeral_system):
+        if numeral_system not in CombinationIndex._indexes:
+            combinations = LazyCombinations(numeral_system,
+                                            CombinationIndex.get_cache_dir())
+            CombinationIndex._indexes[numeral_system] = CombinationIndex(
+                numeral_system, combinations)
+        return CombinationIndex._indexes[numeral_system]
+
+    @staticmethod
+    def get_cache_dir():
+        cache_dir = os.environ.get(CACHE_DIR_VARIABLE)
+        if cache_dir is not None:
+            return cache_dir or None
+        cache_home = os.environ.get('XDG_CACHE_HOME',
+                                    os.path.join('~', '.cache'))
+        return os.path.join(os.path.expanduser(cache_home), 'kakuro')
+
+    @staticmethod
+    def from_table(table, numeral_system):
+        combinations = {}
+        for length in table:
+            for sum_ in table[length]:
+                combs = table[length][sum_][0]
+                combinations[(length, sum_)] = list(map(
+                    lambda x: table_creator.get_mask(
+                        map(lambda y: int(y, 36), x)), combs))
+        return CombinationIndex(numeral_system, combinations)
+
+    @staticmethod
+    def from_binary(filename):
+        combinations = BinaryCombinations(filename)
+        return CombinationIndex(combinations.numeral_system, combinations)
+
+    def get_combinations(self, length, sum_):
+        return self.combinations.get((length, sum_), [])
+
+    def get_candidates(self, length, sum_, used=0, allowed=None):
+        return self.get_digits(length, sum_, used, allowed)[0]
+
+    @functools.lru_cache(maxsize=DIGITS_CACHE_SIZE)
+    def get_digits(self, length, sum_, used=0, allowed=None):
+        if allowed is None:
+            if not used and sum_ and self.masks is not None:
+                eliminated, required = self.masks(length, sum_)
+                return self.full_mask & ~eliminated, required
+            allowed = self.full_mask
+        if not sum_:
+            return allowed & self.full_mask & ~used, 0
+        counter = getattr(self.combinations, 'count_combinations', None)
+        if (counter is not None
+                and counter(length, sum_) > MAX_STORED_COMBINATIONS):
+            return self._get_reachable_digits(length, sum_, used, allowed)
+        free = used | allowed
+        possible = 0
+        required = self.full_mask
+        for comb in self.get_combinations(length, sum_):
+            if comb & used == used and not comb & ~free:
+                possible |= comb
+                required &= comb
+        if not possible:
+            return 0, 0
+        return possible & ~used, required & ~used
+
+    def _get_reachable_digits(self, length, sum_, used, allowed):
+        free = (used | allowed) & self.full_mask
+        if used & ~free:
+            return 0, 0
+        digits = [i for i in range(1, self.numeral_system)
+                  if free >> i & 1 and not used >> i & 1]
+        count = length - bin(used).count('1')
+        total = sum_ - sum(i for i in range(1, self.numeral_system)
+                           if used >> i & 1)
+        if count < 0 or total < 0:
+            return 0, 0
+        limit = (1 << total + 1) - 1
+        forward = [[1] + [0] * count]
+        for digit in digits:
+            last = forward[-1]
+            forward.append([1] + [(last[i] | last[i - 1] << digit) & limit
+                                  for i in range(1, count + 1)])
+        if not forward[-1][count] >> total & 1:
+            return 0, 0
+        possible = 0
+        required = 0
+        backward = [1 << total] + [0] * count
+        for i in range(len(digits) - 1, -1, -1):
+            digit = digits[i]
+            if count and CombinationIndex._meet(forward[i], backward,
+                                                count - 1, digit):
+                possible |= 1 << digit
+            if not CombinationIndex._meet(forward[i], backward, count):
+                required |= 1 << digit
+            backward = [backward[0]] + [backward[j] | backward[j - 1] >> digit
+                                        for j in range(1, count + 1)]
+        return possible, required
+
+    @staticmethod
+    def _meet(before, after, count, shift=0):
+        return any(before[i] << shift & after[count - i]
+                   for i in range(count + 1))
+
+
+class LazyCombinations:
+    def __init__(self, numeral_system, cache_dir=None):
+        self.numeral_system = numeral_system
+        self.cache_dir = cache_dir
+        self.combinations = {}
+        self.counts = None
+        self.dirty = False
+        if cache_dir is not None:
+            self.combinations.update(self._load())
+
+    def _get_filename(self):
+        return os.path.join(self.cache_dir, 'combinations-{0}.json'.format(
+            self.numeral_system))
+
+    def _load(self):
+        try:
+            with open(self._get_filename()) as f:
+                data = json.load(f)
+            if data.get('numeral_system') != self.numeral_system:
+                return {}
+            combinations = {}
+            for key, masks in data['combinations'].items():
+                length, sum_ = map(int, key.split(','))
+                if not all(isinstance(mask, int) for mask in masks):
+                    return {}
+                if len(masks) <= MAX_STORED_COMBINATIONS:
+                    combinations[(length, sum_)] = list(masks)
+            return combinations
+        except (IOError, ValueError, KeyError, TypeError, AttributeError):
+            return {}
+
+    def get(self, key, default=None):
+        if key not in self.combinations:
+            length, sum_ = key
+            max_sum = (2 * self.numeral_system - length - 1) * length // 2
+            if (not 0 < length < self.numeral_system
+                    or not length * (length + 1) // 2 <= sum_ <= max_sum):
+                return default
+            combs = table_creator.find_combinations(length, sum_,
+                                                    self.numeral_system)
+            masks = list(map(table_creator.get_mask, combs))
+            if len(masks) > MAX_STORED_COMBINATIONS:
+                return masks
+            self.combinations[key] = masks
+            if self.cache_dir is not None and not self.dirty:
+                atexit.register(self.save)
+            self.dirty = True
+        return self.combinations[key]
+
+    def count_combinations(self, length, sum_):
+        if self.counts is None:
+            self.counts = LazyCombinations._count_all(self.numeral_system)
+        if not (0 <= length < len(self.counts)
+                and 0 <= sum_ < len(self.counts[length])):
+            return 0
+        return self.counts[length][sum_]
+
+    @staticmethod
+    def _count_all(numeral_system):
+        max_sum = numeral_system * (numeral_system - 1) // 2
+        counts = [[1] + [0] * max_sum]
+        counts.extend([0] * (max_sum + 1) for _ in range(1, numeral_system))
+        for digit in range(1, numeral_system):
+            for length in range(digit, 0, -1):
+                shifted = [0] * digit + counts[length - 1][:-digit]
+                counts[length] = list(map(sum, zip(counts[length], shifted)))
+        return counts
+
+    def save(self):
+        if not self.dirty or self.cache_dir is None:
+            return
+        combinations = self._load()
+        combinations.update(self.combinations)
+        data = {'numeral_system': self.numeral_system,
+                'combinations': dict(map(
+                    lambda x: ('{0},{1}'.format(*x[0]), x[1]),
+                    combinations.items()))}
+        filename = self._get_filename()
+        temp_filename = '{0}.{1}.tmp'.format(filename, os.getpid())
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_filename, 'w') as f:
+                json.dump(data, f, sort_keys=True)
+            os.replace(temp_filename, filename)
+        except OSError:
+            return
+        self.dirty = False
+
+
+class BinaryCombinations:
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.buffer) < table_creator.BINARY_HEADER.size:
+            raise ValueError('Error: table is too short')
+        header = table_creator.BINARY_HEADER.unpack_from(self.buffer)
+        magic, version, self.numeral_system = header[:3]
+        self.max_length, self.max_sum, count = header[3:]
+        if (magic != table_creator.BINARY_MAGIC
+                or version != table_creator.BINARY_VERSION):
+            raise ValueError('Error: unknown table format')
+        self.entries_offset = table_creator.BINARY_HEADER.size
+        entries_size = ((self.max_length + 1) * (self.max_sum + 1)
+                        * table_creator.BINARY_ENTRY.size)
+        self.combinations_offset = self.entries_offset + entries_size
+        if len(self.buffer) != self.combinations_offset + count * 8:
+            raise ValueError('Error: table has wrong size')
+        self.combinations = None
+        if sys.byteorder == 'little':
+            self.combinations = memoryview(self.buffer)[
+                self.combinations_offset:].cast('Q')
+
+    def __reduce__(self):
+        return BinaryCombinations, (self.filename,)
+
+    def _get_entry(self, length, sum_):
+        if not (0 <= length <= self.max_length
+                and 0 <= sum_ <= self.max_sum):
+            return 0, 0, (1 << self.numeral_system) - 2, 0
+        offset = (self.entries_offset
+                  + (length * (self.max_sum + 1) + sum_)
+                  * table_creator.BINARY_ENTRY.size)
+        return table_creator.BINARY_ENTRY.unpack_from(self.buffer, offset)
+
+    def get(self, key, default=None):
+        offset, count = self._get_entry(*key)[:2]
+        if not count:
+            return default
+        if self.combinations is not None:
+            return self.combinations[offset:offset + count]
+        return struct.unpack_from(
+            '<{0}Q'.format(count), self.buffer,
+            self.combinations_offset + offset * 8)
+
+    def get_masks(self, length, sum_):
+        return self._get_entry(length, sum_)[2:]
@@ -0,0 +1,263 @@
+import array
+import copy
+import sys
+import time
+from kakuro_logic import (Kakuro, Cell, Line, Solver, LimitExceeded,
+                          SearchCancelled)
+
+
+class CompactKakuro:
+    def __init__(self, kakuro):
+        self.width = kakuro.width
+        self.height = kakuro.height
+        self.grid = array.array('i', [-1]) * (self.width * self.height)
+        self.labels = {}
+        self.positions = array.array('I')
+        self.domains = array.array('Q')
+        ids = {}
+        for y, row in enumerate(kakuro.map_):
+            for x, cell in enumerate(row):
+                position = y * self.width + x
+                if not isinstance(cell, Cell):
+                    self.labels[position] = cell
+                    continue
+                ids[cell] = len(self.positions)
+                self.grid[position] = ids[cell]
+                self.positions.append(position)
+                self.domains.append(Solver._get_mask(cell.options_cell))
+        self.values = array.array('B', bytes(len(self.positions)))
+        self.cell_runs = array.array('i', [-1]) * (2 * len(self.positions))
+        self.run_offsets = array.array('I', [0])
+        self.run_cells = array.array('I')
+        self.run_sums = array.array('I')
+        for direction in range(2):
+            for line in kakuro.lines[direction]:
+                run = len(self.run_sums)
+                for cell in line.cells:
+                    self.run_cells.append(ids[cell])
+                    self.cell_runs[2 * ids[cell] + direction] = run
+                self.run_offsets.append(len(self.run_cells))
+                self.run_sums.append(line.sum_)
+        self.run_partial = array.array('I', bytes(4 * len(self.run_sums)))
+        self.run_filled = array.array('I', self.run_partial)
+        self.run_used = array.array('Q', bytes(8 * len(self.run_sums)))
+
+    @staticmethod
+    def from_data(data, is_torus):
+        return CompactKakuro(Kakuro(list(data), is_torus))
+
+    def copy(self):
+        board = copy.copy(self)
+        for attr in ['domains', 'values', 'run_partial', 'run_filled',
+                     'run_used']:
+            setattr(board, attr, getattr(self, attr)[:])
+        return board
+
+    def get_run(self, run):
+        return self.run_cells[self.run_offsets[run]:self.run_offsets[run + 1]]
+
+    def get_runs(self, cell):
+        return self.cell_runs[2 * cell:2 * cell + 2]
+
+    def get_cell(self, x, y):
+        return self.grid[y * self.width + x]
+
+    def __str__(self):
+        return self.format_solution(self.get_values())
+
+    def get_values(self):
+        rows = []
+        for y in range(self.height):
+            row = []
+            for position in range(y * self.width, (y + 1) * self.width):
+                cell = self.grid[position]
+                row.append(None if cell < 0 else self.values[cell])
+            rows.append(tuple(row))
+        return tuple(rows)
+
+    def format_solution(self, solution):
+        rows = []
+        for y, values in enumerate(solution):
+            labels = map(lambda x: self.labels.get(y * self.width + x),
+                         range(len(values)))
+            rows.append(Kakuro._format_line(map(Kakuro._format_cell, labels,
+                                                values)))
+        return '\n'.join(rows)
+
+
+class CompactSolver(Solver):
+    def count_solutions(self, kakuro, limit=0):
+        return self._count_by_iteration(kakuro, limit)
+
+    def _iter_solved(self, board, n, prefix):
+        if isinstance(board, Kakuro):
+            board = CompactKakuro(board)
+        board = board.copy()
+        self._start()
+        try:
+            if (self._prepare_board(board)
+                    and self._apply_board_prefix(board, prefix)):
+                yield from self._search(board, n, [])
+        except LimitExceeded:
+            self.limit_exceeded = True
+        except SearchCancelled:
+            pass
+
+    def _prepare_board(self, board):
+        start = time.perf_counter()
+        full_mask = self._get_full_mask()
+        for cell in range(len(board.positions)):
+            runs = board.get_runs(cell)
+            if (min(runs) < 0
+                    or not any(board.run_sums[run] for run in runs)):
+                board.domains[cell] = 0
+                continue
+            domain = board.domains[cell] or full_mask
+            for run in runs:
+                domain &= self._get_line_mask(len(board.get_run(run)),
+                                              board.run_sums[run])
+            board.domains[cell] = domain
+        result = self._propagate_board(board, range(len(board.run_sums)), [])
+        self.stats.add_time('prepare', time.perf_counter() - start)
+        return result
+
+    def _apply_board_prefix(self, board, prefix):
+        for y, x, value in prefix:
+            cell = board.get_cell(x, y)
+            if board.values[cell]:
+                if board.values[cell] != value:
+                    return False
+                continue
+            if not board.domains[cell] & (1 << value):
+                return False
+            CompactSolver._set_value(board, cell, value, [])
+            if not self._propagate_board(board, board.get_runs(cell), []):
+                return False
+        return True
+
+    def _search(self, board, n, trail):
+        self._check_limits(n)
+        cell = CompactSolver._find_cell(board)
+        if cell < 0:
+            self._add_solution()
+            yield board
+            return
+        for value in Solver._get_digits(board.domains[cell]):
+            mark = len(trail)
+            CompactSolver._set_value(board, cell, value, trail)
+            key = divmod(board.positions[cell], board.width)
+            if self.stats.add_node(key, value, self._propagate_board(
+                    board, board.get_runs(cell), trail)):
+                self.stats.depth += 1
+                yield from self._search(board, n, trail)
+                self.stats.depth -= 1
+            CompactSolver._undo(trail, mark)
+            if self.count_results == n:
+                return
+
+    @staticmethod
+    def _find_cell(board):
+        best = -1
+        best_size = sys.maxsize
+        for cell in range(len(board.positions)):
+            if board.values[cell]:
+                continue
+            size = Solver._count_digits(board.domains[cell])
+            if size < best_size:
+                best, best_size = cell, size
+                if size < 2:
+                    break
+        return best
+
+    def _propagate_board(self, board, runs, trail):
+        queue = [run for run in runs if run >= 0]
+        queued = set(queue)
+        while queue:
+            run = queue.pop()
+            queued.discard(run)
+            changed = self._narrow_run(board, run, trail)
+            if changed is None:
+                self.stats.check_lines_failures += 1
+                return False
+            for i in changed:
+                if i >= 0 and i not in queued:
+                    queue.append(i)
+                    queued.add(i)
+        return True
+
+    def _narrow_run(self, board, run, trail):
+        cells = board.get_run(run)
+        sum_ = board.run_sums[run]
+        used = board.run_used[run]
+        if sum_:
+            low, high = Line._get_bounds(
+                used, len(cells) - board.run_filled[run],
+                self.count_of_digits)
+            if not low <= sum_ - board.run_partial[run] <= high:
+                return None
+        empty = [cell for cell in cells if not board.values[cell]]
+        if not empty:
+            return []
+        allowed = 0
+        for cell in empty:
+            allowed |= board.domains[cell]
+        possible, required = self.index.get_digits(len(cells), sum_, used,
+                                                   allowed)
+        if Solver._count_digits(possible) < len(empty):
+            return None
+        domains = [board.domains[cell] & possible for cell in empty]
+        for digit in Solver._get_digits(required):
+            bit = 1 << digit
+            holders = [i for i in range(len(empty)) if domains[i] & bit]
+            if not holders:
+                return None
+            if len(holders) == 1:
+                domains[holders[0]] = bit
+        changed = []
+        singles = []
+        for cell, domain in zip(empty, domains):
+            if not domain:
+                return None
+            if Solver._count_digits(domain) == 1:
+                singles.append(cell)
+            if domain != board.domains[cell]:
+                self.stats.prunings += Solver._count_digits(
+                    board.domains[cell] & ~domain)
+                trail.append((board.domains, cell, board.domains[cell]))
+                board.domains[cell] = domain
+                changed.extend(board.get_runs(cell))
+        for cell in singles:
+            if board.values[cell]:
+                continue
+            if not board.domains[cell]:
+                return None
+            CompactSolver._set_value(
+                board, cell, Solver._get_digits(board.domains[cell])[0],
+                trail)
+            changed.extend(board.get_runs(cell))
+        return changed
+
+    @staticmethod
+    def _set_value(board, cell, value, trail):
+        bit = 1 << value
+        trail.append((board.values, cell, 0))
+        board.values[cell] = value
+        for run in board.get_runs(cell):
+            if run < 0:
+                continue
+            for attr in [board.run_partial, board.run_filled,
+                         board.run_used]:
+                trail.append((attr, run, attr[run]))
+            board.run_partial[run] += value
+            board.run_filled[run] += 1
+            board.run_used[run] |= bit
+            for i in board.get_run(run):
+                if i != cell and board.domains[i] & bit:
+                    trail.append((board.domains, i, board.domains[i]))
+                    board.domains[i] &= ~bit
+
+    @staticmethod
+    def _undo(trail, mark):
+        while len(trail) > mark:
+            values, i, value = trail.pop()
+            values[i] = value
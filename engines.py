@@ -0,0 +1,13 @@
+from kakuro_logic import Solver
+from compact_kakuro import CompactSolver
+from exact_cover import ExactCoverSolver
+
+ENGINES = {'search': Solver,
+           'compact': CompactSolver,
+           'dlx': ExactCoverSolver}
+
+
+def create_solver(engine, *args, **kwargs):
+    if engine not in ENGINES:
+        raise ValueError("Error: undefined engine '{}'".format(engine))
+    return ENGINES[engine](*args, **kwargs)
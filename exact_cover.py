@@ -0,0 +1,214 @@
+import functools
+import itertools
+import time
+from kakuro_logic import (Cell, Kakuro, Solver, LimitExceeded,
+                          SearchCancelled)
+
+
+class DancingLinks:
+    def __init__(self, primary, secondary=()):
+        self.names = [None] + list(primary) + list(secondary)
+        count = len(self.names)
+        self.columns = dict(map(reversed, enumerate(self.names)))
+        self.left = list(range(-1, count - 1))
+        self.right = list(range(1, count + 1))
+        self.up = list(range(count))
+        self.down = list(range(count))
+        self.column = list(range(count))
+        self.size = [0] * count
+        self.rows = [None] * count
+        last = len(primary)
+        self.left[0] = last
+        self.right[last] = 0
+        for i in range(last + 1, count):
+            self.left[i] = self.right[i] = i
+
+    def add_row(self, names, row):
+        first = None
+        for name in names:
+            column = self.columns[name]
+            node = len(self.column)
+            self.column.append(column)
+            self.rows.append(row)
+            self.up.append(self.up[column])
+            self.down.append(column)
+            self.down[self.up[column]] = node
+            self.up[column] = node
+            self.size[column] += 1
+            if first is None:
+                first = node
+                self.left.append(node)
+                self.right.append(node)
+            else:
+                self.left.append(self.left[first])
+                self.right.append(first)
+                self.right[self.left[first]] = node
+                self.left[first] = node
+
+    def iter_covers(self, check=None):
+        choices = []
+        column = self._choose()
+        if column is None:
+            yield []
+            return
+        self._cover(column)
+        node = self.down[column]
+        while True:
+            if node == column:
+                self._uncover(column)
+                if not choices:
+                    return
+                node = choices.pop()
+                column = self.column[node]
+                self._unselect(node)
+                node = self.down[node]
+                continue
+            choices.append(node)
+            self._select(node)
+            next_column = self._choose()
+            if check is not None:
+                check(self.rows[node], len(choices) - 1,
+                      next_column is None or self.size[next_column] > 0)
+            if next_column is None:
+                yield list(map(lambda x: self.rows[x], choices))
+            elif self.size[next_column]:
+                self._cover(next_column)
+                column = next_column
+                node = self.down[column]
+                continue
+            choices.pop()
+            self._unselect(node)
+            node = self.down[node]
+
+    def _choose(self):
+        best = None
+        column = self.right[0]
+        while column:
+            if best is None or self.size[column] < self.size[best]:
+                best = column
+                if self.size[column] < 2:
+                    break
+            column = self.right[column]
+        return best
+
+    def _select(self, node):
+        i = self.right[node]
+        while i != node:
+            self._cover(self.column[i])
+            i = self.right[i]
+
+    def _unselect(self, node):
+        i = self.left[node]
+        while i != node:
+            self._uncover(self.column[i])
+            i = self.left[i]
+
+    def _cover(self, column):
+        self.left[self.right[column]] = self.left[column]
+        self.right[self.left[column]] = self.right[column]
+        i = self.down[column]
+        while i != column:
+            j = self.right[i]
+            while j != i:
+                self.up[self.down[j]] = self.up[j]
+                self.down[self.up[j]] = self.down[j]
+                self.size[self.column[j]] -= 1
+                j = self.right[j]
+            i = self.down[i]
+
+    def _uncover(self, column):
+        i = self.up[column]
+        while i != column:
+            j = self.left[i]
+            while j != i:
+                self.size[self.column[j]] += 1
+                self.up[self.down[j]] = j
+                self.down[self.up[j]] = j
+                j = self.left[j]
+            i = self.up[i]
+        self.left[self.right[column]] = column
+        self.right[self.left[column]] = column
+
+
+class ExactCoverSolver(Solver):
+    def count_solutions(self, kakuro, limit=0):
+        return self._count_by_iteration(kakuro, limit)
+
+    def _iter_solved(self, kakuro, n, prefix):
+        self._start()
+        trail = []
+        try:
+            if (self._prepare(kakuro)
+                    and self._apply_prefix(kakuro, prefix, trail)):
+                self.queue = None
+                start = time.perf_counter()
+                links = self._create_links(kakuro)
+                self.stats.add_time('prepare', time.perf_counter() - start)
+                check = functools.partial(self._check_node, n)
+                for rows in links.iter_covers(check):
+                    mark = len(trail)
+                    for cell, value in filter(None, rows):
+                        trail.append((cell, 'value', cell.value))
+                        cell.value = '[{0}]'.format(
+                            Kakuro._get_str_from_int(value))
+                    self._add_solution()
+                    yield kakuro
+                    Solver._undo(trail, mark)
+                    if self.count_results == n:
+                        return
+        except LimitExceeded:
+            self.limit_exceeded = True
+        except SearchCancelled:
+            pass
+        finally:
+            Solver._undo(trail, 0)
+            self.queue = None
+
+    def _check_node(self, n, row, depth, consistent):
+        self._check_limits(n)
+        self.stats.depth = depth
+        if row is None:
+            self.stats.add_node(None, None, consistent)
+        else:
+            cell, value = row
+            self._add_node(cell, value, consistent)
+
+    def _create_links(self, kakuro):
+        cells = [j for i in kakuro.map_ for j in i if isinstance(j, Cell)]
+        lines = list(dict.fromkeys(itertools.chain.from_iterable(
+            map(lambda x: (x.hor_line, x.vert_line), cells))))
+        digits = range(1, self.count_of_digits)
+        primary = list(cells)
+        secondary = []
+        for line in lines:
+            names = list(map(lambda x: (line, x), digits))
+            if line.sum_:
+                primary.append(line)
+                primary.extend(names)
+            else:
+                secondary.extend(names)
+        links = DancingLinks(primary, secondary)
+        for cell in cells:
+            for value in self._get_cell_digits(cell):
+                names = [cell, (cell.hor_line, value),
+                         (cell.vert_line, value)]
+                links.add_row(names, (cell, value))
+        for line in lines:
+            if not line.sum_:
+                continue
+            allowed = 0
+            for cell in line.cells:
+                allowed |= Solver._get_mask(self._get_cell_digits(cell))
+            for comb in self.index.get_combinations(len(line.cells),
+                                                    line.sum_):
+                if comb & ~allowed:
+                    continue
+                names = [(line, i) for i in digits if not comb >> i & 1]
+                links.add_row([line] + names, None)
+        return links
+
+    @staticmethod
+    def _get_cell_digits(cell):
+        if cell.value != '[*]':
+            return [Kakuro._get_int_from_str(cell.value[1:-1])]
+        return Solver._get_digits(cell.domain)
@@ -1,11 +1,17 @@
 import itertools
 import argparse
 import copy
+import json
 import re
 import sys
+import time
 import table_creator
 import functools
-from kakuro_logic import Cell, Kakuro, Solver
+import kakuro_parallel
+from combination_index import CombinationIndex
+from kakuro_logic import Cell, Kakuro, Solver, SearchStats, HEURISTICS
+from engines import ENGINES, create_solver
+from solution_cache import SolutionCache
 
 
 def main():
@@ -18,44 +24,157 @@ def main():
                         help='Name of table with combinations')
     parser.add_argument('-t', '--tor', action='store_true',
                         help='Solve torus kakuro')
+    parser.add_argument('--heuristic', choices=HEURISTICS, default='row',
+                        help='Order of choosing cells during the search')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='search',
+                        help='Solving engine')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Count of processes for the search')
+    parser.add_argument('--count', action='store_true',
+                        help='Print only the count of found solutions')
+    parser.add_argument('--unique', action='store_true',
+                        help='Check whether the solution is unique')
+    parser.add_argument('--timeout', type=float,
+                        help='Time limit for the search in seconds')
+    parser.add_argument('--max-nodes', type=int,
+                        help='Limit of nodes of the search tree')
+    parser.add_argument('--cache', action='store_true',
+                        help='Cache solutions in memory and on disk')
+    parser.add_argument('--stats', action='store_true',
+                        help='Print statistics of the search to stderr')
+    parser.add_argument('--stats-json', metavar='FILENAME',
+                        help='Write statistics of the search to file as JSON')
     parser.add_argument('filename', type=str,
                         help='Name of file with map of kakuro')
     args = parser.parse_args()
+    if not 2 <= args.numSys <= table_creator.MAX_NUMERAL_SYSTEM:
+        parser.error('numeral system must be from 2 to {0}'.format(
+            table_creator.MAX_NUMERAL_SYSTEM))
+    parallel = args.jobs > 1 and not args.unique
+    if parallel and args.cache:
+        parser.error('--cache can not be used with -j')
     table = None
     if args.table is not None:
-        try:
-            table = load_table(args.table[0])
-        except IOError as e:
-            print(e, file=sys.stderr)
-            sys.exit(9)
-        except ValueError as e:
-            print('Error: table is not valid\n', file=sys.stderr)
-            sys.exit(10)
-    if args.filename is not None:
-        try:
-            data = load_data(args.filename)
-        except IOError as e:
-            print(e, file=sys.stderr)
-            sys.exit(7)
+        table = load_table_or_exit(args.table[0], args.numSys)
+    start = time.perf_counter()
     try:
-        myKakuro = Kakuro(data, args.tor)
+        myKakuro = Kakuro.from_file(args.filename, args.tor, args.numSys)
+        if parallel:
+            data = load_data(args.filename)
+    except IOError as e:
+        print(e, file=sys.stderr)
+        sys.exit(7)
     except ValueError as e:
         print(e, file=sys.stderr)
         sys.exit(8)
-    solver = Solver(args.numSys, table)
-    solver.print_solutions(myKakuro, args.n)
-    if not solver.count_results:
+    parse_time = time.perf_counter() - start
+    has_budget = args.timeout is not None or args.max_nodes is not None
+    solver = None
+    if not parallel:
+        solver = create_solver(args.engine, args.numSys, table,
+                               heuristic=args.heuristic,
+                               time_limit=args.timeout,
+                               node_limit=args.max_nodes)
+    if ((args.unique or args.count and not parallel) and not has_budget
+            and not args.cache):
+        if args.unique:
+            count = solver.count_solutions(myKakuro, 2)
+            if count:
+                print('unique' if count == 1 else 'multiple')
+        else:
+            count = solver.count_solutions(myKakuro, max(args.n, 0))
+            print(count)
+        write_stats(solver.stats, args, parse_time)
+        if not count:
+            print('No solutions', file=sys.stderr)
+            sys.exit(1)
+        return
+    progress = {}
+    search_start = time.perf_counter()
+    if parallel:
+        solutions = kakuro_parallel.iter_parallel(
+            data, args.tor, args.numSys, table, args.n, args.jobs,
+            args.heuristic, args.engine, args.timeout, args.max_nodes,
+            progress)
+    elif args.cache:
+        solutions, _ = SolutionCache.with_default_dir().solve(
+            solver, myKakuro, 2 if args.unique else args.n)
+    else:
+        solutions = solver.iter_solutions(myKakuro,
+                                          2 if args.unique else args.n)
+    count = 0
+    format_time = 0
+    for solution in solutions:
+        count += 1
+        if not args.count and not args.unique:
+            start = time.perf_counter()
+            text = myKakuro.format_solution(solution)
+            format_time += time.perf_counter() - start
+            print(text + '\n', flush=True)
+    elapsed = time.perf_counter() - search_start
+    if parallel:
+        stats = progress.get('stats', SearchStats())
+    else:
+        stats = solver.stats
+        progress = {'nodes': stats.nodes,
+                    'limit_reason': solver.limit_reason}
+    if args.count:
+        print(count)
+    if args.unique and count and (count > 1
+                                  or progress.get('limit_reason') is None):
+        print('unique' if count == 1 else 'multiple')
+    stats.add_time('format', format_time)
+    write_stats(stats, args, parse_time)
+    if progress.get('limit_reason') is not None:
+        print('Budget exhausted ({0}): {1} solutions found, {2} nodes '
+              'searched in {3:.3f} s'.format(
+                  progress['limit_reason'], count,
+                  progress.get('nodes', 0), elapsed), file=sys.stderr)
+        sys.exit(11)
+    if not count:
         print('No solutions', file=sys.stderr)
         sys.exit(1)
 
 
+def write_stats(stats, args, parse_time):
+    stats.add_time('parse', parse_time)
+    if args.stats:
+        print(stats.format(), file=sys.stderr)
+    if args.stats_json is not None:
+        try:
+            with open(args.stats_json, 'w') as f:
+                f.write(json.dumps(stats.to_dict(), sort_keys=True))
+        except IOError as e:
+            print(e, file=sys.stderr)
+            sys.exit(7)
+
+
 def load_data(filename):
     with open(filename) as f:
         data = f.read()
     return data.rstrip().split('\n')
 
 
+def load_table_or_exit(filename, numeral_system=None):
+    try:
+        table = load_table(filename)
+        if (isinstance(table, CombinationIndex) and numeral_system
+                and table.numeral_system != numeral_system):
+            raise ValueError
+        return table
+    except IOError as e:
+        print(e, file=sys.stderr)
+        sys.exit(9)
+    except ValueError as e:
+        print('Error: table is not valid\n', file=sys.stderr)
+        sys.exit(10)
+
+
 def load_table(filename):
+    with open(filename, 'rb') as f:
+        is_binary = f.read(4) == table_creator.BINARY_MAGIC
+    if is_binary:
+        return CombinationIndex.from_binary(filename)
     table = {}
     with open(filename) as f:
         info = list(map(int, f.readline().split()))
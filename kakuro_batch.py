@@ -0,0 +1,182 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import kakuro
+import table_creator
+from kakuro_logic import Kakuro, HEURISTICS
+from engines import ENGINES, create_solver
+from solution_cache import SolutionCache
+
+GLOB_CHARS = '*?['
+
+worker_solver = None
+worker_cache = None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=1, help='Count of solutions')
+    parser.add_argument('--numSys', type=int, default=10,
+                        help='Numeral system')
+    parser.add_argument('--table', nargs=1,
+                        help='Name of table with combinations')
+    parser.add_argument('-t', '--tor', action='store_true',
+                        help='Solve torus kakuro')
+    parser.add_argument('--heuristic', choices=HEURISTICS, default='row',
+                        help='Order of choosing cells during the search')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='search',
+                        help='Solving engine')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Count of worker processes')
+    parser.add_argument('--unordered', action='store_true',
+                        help='Write results as soon as they are ready')
+    parser.add_argument('--timeout', type=float,
+                        help='Time limit for one puzzle in seconds')
+    parser.add_argument('--max-nodes', type=int,
+                        help='Limit of nodes of the search for one puzzle')
+    parser.add_argument('--stats', action='store_true',
+                        help='Add statistics of the search to results')
+    parser.add_argument('--cache', action='store_true',
+                        help='Cache solutions in memory and on disk')
+    parser.add_argument('-o', '--output',
+                        help='Name of file for results (stdout by default)')
+    parser.add_argument('sources', nargs='+',
+                        help='Directories, glob patterns or files with maps '
+                             'of kakuro separated by blank lines '
+                             '("-" for stdin)')
+    args = parser.parse_args()
+    if not 2 <= args.numSys <= table_creator.MAX_NUMERAL_SYSTEM:
+        parser.error('numeral system must be from 2 to {0}'.format(
+            table_creator.MAX_NUMERAL_SYSTEM))
+    table = None
+    if args.table is not None:
+        table = kakuro.load_table_or_exit(args.table[0], args.numSys)
+    initargs = (args.numSys, table, args.heuristic, args.timeout,
+                args.engine, args.max_nodes, args.cache)
+    pool = None
+    try:
+        tasks = map(lambda x: x + (args.tor, args.n, args.stats),
+                    iter_puzzles(args.sources))
+        if args.jobs > 1:
+            pool = multiprocessing.Pool(args.jobs, init_worker, initargs)
+            if args.unordered:
+                records = pool.imap_unordered(solve_task, tasks)
+            else:
+                records = pool.imap(solve_task, tasks)
+        else:
+            init_worker(*initargs)
+            records = map(solve_task, tasks)
+        write_records(records, args.output)
+    except IOError as e:
+        print(e, file=sys.stderr)
+        sys.exit(7)
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+def init_worker(numeral_system, table, heuristic, time_limit,
+                engine='search', node_limit=None, cache=False):
+    global worker_solver, worker_cache
+    worker_solver = create_solver(engine, numeral_system, table,
+                                  heuristic=heuristic, time_limit=time_limit,
+                                  node_limit=node_limit)
+    worker_cache = SolutionCache.with_default_dir() if cache else None
+
+
+def solve_task(task):
+    filename, number, data, is_torus, n, stats = task
+    record = solve_puzzle(worker_solver, data, is_torus, n, stats,
+                          worker_cache)
+    record['file'] = filename
+    record['puzzle'] = number
+    return record
+
+
+def write_records(records, output_name=None):
+    output = sys.stdout
+    if output_name is not None:
+        output = open(output_name, 'w')
+    try:
+        for record in records:
+            output.write(json.dumps(record, sort_keys=True) + '\n')
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def iter_puzzles(sources):
+    for source in sources:
+        for filename in find_files(source):
+            if filename == '-':
+                puzzles = split_puzzles(sys.stdin)
+                for number, data in enumerate(puzzles, 1):
+                    yield filename, number, data
+                continue
+            with open(filename) as f:
+                for number, data in enumerate(split_puzzles(f), 1):
+                    yield filename, number, data
+
+
+def find_files(source):
+    if os.path.isdir(source):
+        names = sorted(os.listdir(source))
+        files = map(lambda x: os.path.join(source, x), names)
+        return list(filter(os.path.isfile, files))
+    if any(char in source for char in GLOB_CHARS):
+        return list(filter(os.path.isfile, sorted(glob.glob(source))))
+    return [source]
+
+
+def split_puzzles(lines):
+    data = []
+    for line in lines:
+        line = line.rstrip()
+        if line:
+            data.append(line)
+        elif data:
+            yield data
+            data = []
+    if data:
+        yield data
+
+
+def solve_puzzle(solver, data, is_torus, n=sys.maxsize, stats=False,
+                 cache=None):
+    try:
+        kakuro_ = Kakuro(data, is_torus, solver.count_of_digits)
+    except ValueError as e:
+        return {'status': 'invalid', 'error': str(e),
+                'count': 0, 'solutions': []}
+    if cache is not None:
+        solutions, cached = cache.solve(solver, kakuro_, n)
+        solutions = list(map(kakuro_.format_solution, solutions))
+        if cached:
+            return {'status': 'solved' if solutions else 'no_solutions',
+                    'count': len(solutions), 'solutions': solutions,
+                    'nodes': 0, 'cached': True}
+    else:
+        solutions = list(solver.solve(kakuro_, n))
+    if solver.limit_reason == 'nodes':
+        status = 'node_limit'
+    elif solver.limit_exceeded:
+        status = 'timeout'
+    elif solutions:
+        status = 'solved'
+    else:
+        status = 'no_solutions'
+    record = {'status': status, 'count': len(solutions),
+              'solutions': solutions, 'nodes': solver.stats.nodes}
+    if cache is not None:
+        record['cached'] = False
+    if stats:
+        record['stats'] = solver.stats.to_dict()
+    return record
+
+
+if __name__ == '__main__':
+    main()
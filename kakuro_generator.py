@@ -0,0 +1,250 @@
+import argparse
+import random
+import sys
+import table_creator
+from kakuro_logic import Kakuro, Solver
+
+RUN_LENGTH = 4
+DENSITY = 0.9
+ATTEMPTS = 100
+REFILLS = 40
+NODE_LIMIT = 5000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-c', '--count', type=int, default=1,
+                        help='Count of puzzles')
+    parser.add_argument('--size', type=int, default=8,
+                        help='Width and height of puzzles')
+    parser.add_argument('--density', type=float, default=DENSITY,
+                        help='Share of empty cells before the cleanup')
+    parser.add_argument('--numSys', type=int, default=10,
+                        help='Numeral system')
+    parser.add_argument('--run-length', type=int, default=RUN_LENGTH,
+                        help='Maximal length of lines')
+    parser.add_argument('-t', '--tor', action='store_true',
+                        help='Generate torus kakuro')
+    parser.add_argument('--seed', type=int,
+                        help='Seed of the random generator')
+    parser.add_argument('--attempts', type=int, default=ATTEMPTS,
+                        help='Count of grids tried for one puzzle')
+    parser.add_argument('-o', '--output',
+                        help='Name of file for puzzles (stdout by default)')
+    args = parser.parse_args()
+    if not 2 <= args.numSys <= table_creator.MAX_NUMERAL_SYSTEM:
+        parser.error('numeral system must be from 2 to {0}'.format(
+            table_creator.MAX_NUMERAL_SYSTEM))
+    if args.size < 3:
+        parser.error('size must be at least 3')
+    if not 0 < args.density <= 1:
+        parser.error('density must be from 0 to 1')
+    rng = random.Random(args.seed)
+    solver = Solver(args.numSys, node_limit=NODE_LIMIT)
+    output = sys.stdout
+    try:
+        if args.output is not None:
+            output = open(args.output, 'w')
+        for i in range(args.count):
+            data = generate_unique(args.size, args.numSys, args.density,
+                                   args.tor, rng, args.run_length,
+                                   args.attempts, solver)
+            if data is None:
+                print('Error: puzzle can not be generated', file=sys.stderr)
+                sys.exit(1)
+            if i:
+                output.write('\n')
+            output.write('\n'.join(data) + '\n')
+            output.flush()
+    except IOError as e:
+        print(e, file=sys.stderr)
+        sys.exit(7)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def generate_unique(size, numeral_system=10, density=DENSITY, is_torus=False,
+                    rng=random, run_length=RUN_LENGTH, attempts=ATTEMPTS,
+                    solver=None):
+    if solver is None:
+        solver = Solver(numeral_system, node_limit=NODE_LIMIT)
+    run_length = min(run_length, numeral_system - 1)
+    for _ in range(attempts):
+        is_cell = create_layout(size, density, run_length, is_torus, rng)
+        try:
+            values = fill_digits(is_cell, numeral_system, rng, is_torus)
+        except ValueError:
+            continue
+        refills = REFILLS
+        while values:
+            data = format_puzzle(is_cell, values, is_torus)
+            count = solver.count_solutions(Kakuro(list(data), is_torus), 2)
+            if count == 1:
+                return data
+            if not count and not solver.limit_exceeded:
+                break
+            solutions = list(solver.iter_solutions(
+                Kakuro(list(data), is_torus), 2))
+            cells = list(values)
+            if len(solutions) > 1:
+                cells = [(y, x) for y, row in enumerate(solutions[0])
+                         for x, value in enumerate(row)
+                         if value != solutions[1][y][x]]
+            if refills:
+                refills -= 1
+                fixed = dict(filter(lambda x: x[0] not in cells,
+                                    values.items()))
+                try:
+                    values = fill_digits(is_cell, numeral_system, rng,
+                                         is_torus, fixed)
+                    continue
+                except ValueError:
+                    pass
+            y, x = rng.choice(cells)
+            is_cell[y][x] = False
+            remove_short_runs(is_cell, is_torus)
+            values = dict(filter(lambda x: is_cell[x[0][0]][x[0][1]],
+                                 values.items()))
+    return None
+
+
+def generate_puzzle(size, numeral_system=10, rng=random,
+                    run_length=RUN_LENGTH, density=None, is_torus=False):
+    run_length = min(run_length, numeral_system - 1)
+    if density is None:
+        is_cell = [[0 < x and 0 < y and (x + 2 * y) % (run_length + 1)
+                    for x in range(size)] for y in range(size)]
+        remove_short_runs(is_cell, is_torus)
+    else:
+        is_cell = create_layout(size, density, run_length, is_torus, rng)
+    values = fill_digits(is_cell, numeral_system, rng, is_torus)
+    return format_puzzle(is_cell, values, is_torus)
+
+
+def create_layout(size, density, run_length=RUN_LENGTH, is_torus=False,
+                  rng=random):
+    offset = rng.randrange(run_length + 1)
+    is_cell = [[(is_torus or 0 < x and 0 < y)
+                and (x + 2 * y + offset) % (run_length + 1) != 0
+                and rng.random() < density
+                for x in range(size)] for y in range(size)]
+    split = True
+    while split:
+        split = False
+        for y in range(size):
+            for x in range(size):
+                for dy, dx in [(0, 1), (1, 0)]:
+                    run = get_line(is_cell, y, x, dy, dx, is_torus)
+                    if len(run) > run_length:
+                        i, j = run[rng.randint(2, max(len(run) - 3, 2))]
+                        is_cell[i][j] = False
+                        split = True
+    remove_short_runs(is_cell, is_torus)
+    return is_cell
+
+
+def remove_short_runs(is_cell, is_torus=False):
+    removed = True
+    while removed:
+        removed = False
+        for y in range(len(is_cell)):
+            for x in range(len(is_cell[0])):
+                if is_cell[y][x] and (
+                        not get_run(is_cell, y, x, 0, 1, is_torus)
+                        or not get_run(is_cell, y, x, 1, 0, is_torus)):
+                    is_cell[y][x] = False
+                    removed = True
+
+
+def fill_digits(is_cell, numeral_system, rng=random, is_torus=False,
+                values=None):
+    values = dict(values or {})
+    cells = [(y, x) for y in range(len(is_cell))
+             for x in range(len(is_cell[0]))
+             if is_cell[y][x] and (y, x) not in values]
+    stack = []
+    while len(stack) < len(cells):
+        y, x = cells[len(stack)]
+        used = set(map(values.get, get_run(is_cell, y, x, 0, 1, is_torus)
+                       + get_run(is_cell, y, x, 1, 0, is_torus)))
+        digits = [i for i in range(1, numeral_system) if i not in used]
+        digits.sort(key=lambda x: abs(2 * x - numeral_system)
+                    + numeral_system * rng.random())
+        stack.append(digits)
+        while stack and not stack[-1]:
+            stack.pop()
+            values.pop(cells[len(stack)], None)
+        if not stack:
+            raise ValueError('Error: digits can not be placed')
+        values[cells[len(stack) - 1]] = stack[-1].pop()
+    return values
+
+
+def get_run(is_cell, y, x, dy, dx, is_torus=False):
+    height, width = len(is_cell), len(is_cell[0])
+    result = []
+    for direction in [-1, 1]:
+        i, j = y + dy * direction, x + dx * direction
+        while True:
+            if is_torus:
+                i, j = i % height, j % width
+            if (not (0 <= i < height and 0 <= j < width)
+                    or not is_cell[i][j] or (i, j) == (y, x)
+                    or (i, j) in result):
+                break
+            result.append((i, j))
+            i, j = i + dy * direction, j + dx * direction
+    return result
+
+
+def get_line(is_cell, y, x, dy, dx, is_torus=False):
+    if not is_cell[y][x]:
+        return []
+    run = get_run(is_cell, y, x, dy, dx, is_torus)
+    start = (y, x)
+    for _ in run:
+        i, j = start[0] - dy, start[1] - dx
+        if is_torus:
+            i, j = i % len(is_cell), j % len(is_cell[0])
+        if (i, j) not in run:
+            break
+        start = (i, j)
+    result = [start]
+    for _ in run:
+        i, j = result[-1][0] + dy, result[-1][1] + dx
+        if is_torus:
+            i, j = i % len(is_cell), j % len(is_cell[0])
+        result.append((i, j))
+    return result
+
+
+def format_puzzle(is_cell, values, is_torus=False):
+    height, width = len(is_cell), len(is_cell[0])
+    lines = []
+    for y, row in enumerate(is_cell):
+        line = []
+        for x, cell in enumerate(row):
+            if cell:
+                line.append('[*]')
+                continue
+            sums = []
+            for dy, dx in [(1, 0), (0, 1)]:
+                i, j = y + dy, x + dx
+                if is_torus:
+                    i, j = i % height, j % width
+                if i < height and j < width and is_cell[i][j]:
+                    run = [(i, j)] + get_run(is_cell, i, j, dy, dx, is_torus)
+                    sums.append(str(sum(map(values.get, run))))
+                else:
+                    sums.append('-')
+            if sums == ['-', '-']:
+                line.append('[-]')
+            else:
+                line.append('[{0}\\{1}]'.format(*sums))
+        lines.append(' '.join(line))
+    return lines
+
+
+if __name__ == '__main__':
+    main()
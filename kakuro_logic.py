@@ -1,23 +1,148 @@
 import itertools
 import argparse
+import collections
 import copy
 import re
 import sys
-import table_creator
 import functools
+import heapq
+import time
+from combination_index import CombinationIndex, DIGITS_CACHE_SIZE
 
-SUM_PATTERN = re.compile(r'^\[(.{1,2})\\(.{1,2})\]$')
-CELL_PATTERN = re.compile(r'^\[[a-fA-F0-9](-[a-fA-F0-9])*\]$')
+SUM_PATTERN = re.compile(r'^\[(.{1,3})\\(.{1,3})\]$')
 HORIZONTAL = 'hor'
 VERTICAL = 'vert'
+HEURISTICS = ['row', 'mrv', 'degree', 'tight']
+NODE_BATCH = 256
+QUEUE_SLACK = 64
+
+
+class MapFormatError(ValueError):
+    def __init__(self, errors):
+        super().__init__('\n'.join(errors))
+        self.errors = errors
+
+
+class LimitExceeded(Exception):
+    pass
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+class SearchStats:
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.reset()
+
+    def reset(self):
+        self.nodes = 0
+        self.backtracks = 0
+        self.check_lines_failures = 0
+        self.prunings = 0
+        self.solutions = 0
+        self.depth = 0
+        self.values_tried = collections.Counter()
+        self.depths = collections.Counter()
+        self.phases = collections.defaultdict(float)
+
+    def add_node(self, key, value, consistent):
+        self.nodes += 1
+        self.depths[self.depth] += 1
+        if key is not None:
+            self.values_tried[key] += 1
+        if not consistent:
+            self.backtracks += 1
+        if self.callback is not None:
+            self.callback('node' if consistent else 'backtrack', key, value,
+                          self.depth)
+        return consistent
+
+    def add_solution(self):
+        self.solutions += 1
+        if self.callback is not None:
+            self.callback('solution', None, None, self.depth)
+
+    def add_time(self, phase, seconds):
+        self.phases[phase] += seconds
+
+    def merge(self, other):
+        self.nodes += other.nodes
+        self.backtracks += other.backtracks
+        self.check_lines_failures += other.check_lines_failures
+        self.prunings += other.prunings
+        self.solutions += other.solutions
+        self.values_tried.update(other.values_tried)
+        self.depths.update(other.depths)
+        for phase, seconds in other.phases.items():
+            self.phases[phase] += seconds
+
+    def to_dict(self):
+        return {'nodes': self.nodes,
+                'backtracks': self.backtracks,
+                'check_lines_failures': self.check_lines_failures,
+                'prunings': self.prunings,
+                'solutions': self.solutions,
+                'values_tried': dict(map(
+                    lambda x: ('{0},{1}'.format(*x[0]), x[1]),
+                    sorted(self.values_tried.items()))),
+                'depths': dict(map(lambda x: (str(x[0]), x[1]),
+                                   sorted(self.depths.items()))),
+                'phases': dict(self.phases)}
+
+    def format(self, top=10):
+        lines = ['nodes: {0}'.format(self.nodes),
+                 'backtracks: {0}'.format(self.backtracks),
+                 'check_lines failures: {0}'.format(
+                     self.check_lines_failures),
+                 'prunings: {0}'.format(self.prunings),
+                 'solutions: {0}'.format(self.solutions)]
+        for phase, seconds in sorted(self.phases.items()):
+            lines.append('time of {0}: {1:.6f} s'.format(phase, seconds))
+        if self.depths:
+            lines.append('nodes by depth:')
+            for depth, count in sorted(self.depths.items()):
+                lines.append('    {0}: {1}'.format(depth, count))
+        if self.values_tried:
+            lines.append('values tried by cell (row, column):')
+            for key, count in self.values_tried.most_common(top):
+                lines.append('    {0}: {1}'.format(key, count))
+        return '\n'.join(lines)
 
 
 class Solver:
-    def __init__(self, count_of_digits, table=None):
+    def __init__(self, count_of_digits, table=None, in_place=True,
+                 heuristic='row', time_limit=None, decompose=True,
+                 callback=None, node_limit=None):
+        if heuristic not in HEURISTICS:
+            raise ValueError(
+                "Error: undefined heuristic '{}'".format(heuristic))
         self.count_of_digits = count_of_digits
         self.table = table
-        self.count_results = 0
-        self.solutions = []
+        self.in_place = in_place
+        self.heuristic = heuristic
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.decompose = decompose
+        self.deadline = None
+        self.limit_exceeded = False
+        self.limit_reason = None
+        self.shared_count = None
+        self.shared_deadline = None
+        self.shared_nodes = None
+        self.reported_nodes = 0
+        self.shared_total = 0
+        self.queue = None
+        if isinstance(table, CombinationIndex):
+            self.index = table
+        elif table:
+            self.index = CombinationIndex.from_table(table, count_of_digits)
+        else:
+            self.index = CombinationIndex.for_numeral_system(count_of_digits)
+        self.memo = None
+        self.stats = SearchStats(callback)
+        self.reset()
 
     @staticmethod
     def _process_regular_digits(digits):
@@ -26,63 +151,37 @@ class Solver:
 
     @staticmethod
     def _get_range_digits(n):
-        result = list(map(str, range(1, n)))
-        for i in range(9, len(result)):
-            if int(result[i]) >= 10:
-                result[i] = chr(ord('a') + int(result[i]) % 10)
-        return result
+        return list(map(Kakuro._get_str_from_int, range(1, n)))
 
-    def _get_possible_values(self, j):
-        if j.hor_length != 1 and j.hor_sum:
-            data = self._get_regular_nums(j.hor_length,
-                                          j.hor_sum)
-            eliminated_hor, used_hor = data
-        else:
-            used_hor = Solver._get_range_digits(self.count_of_digits)
-            eliminated_hor = []
-        if j.vert_length != 1 and j.vert_sum:
-            data = self._get_regular_nums(j.vert_length,
-                                          j.vert_sum)
-            eliminated_vert, used_vert = data
-        else:
-            used_vert = Solver._get_range_digits(self.count_of_digits)
-            eliminated_vert = []
-        intersection_digits = list(set(used_hor).intersection(used_vert))
-        union_digits = list(set(eliminated_hor).union(eliminated_vert))
-        options = list(map(lambda x: int(x) if x.isdigit() else x,
-                           j.options_cell))
-        if options:
-            intersection_digits = list(
-                set(options).intersection(intersection_digits)
-            )
-            digits = Solver._get_range_digits(self.count_of_digits)
-            digits = map(lambda x: int(x) if x.isdigit() else x, digits)
-            eliminated = set(digits).difference(options)
-            union_digits = list(set(union_digits).union(eliminated))
-        return intersection_digits, union_digits
-
-    @functools.lru_cache(maxsize=None)
-    def _get_regular_nums(self, length, sum_):
-        if not self.table:
-            combs = Solver._get_combinations(sum_,
-                                             length,
-                                             self.count_of_digits)
-        else:
-            combs = self.table[length][sum_][0]
-            combs = list(map(
-                lambda x: list(map(
-                    lambda y: int(y, self.count_of_digits), x)), combs))
-        result = table_creator.find_regular_nums(combs, self.count_of_digits)
-        return (result[1], result[0])
+    def _get_line_mask(self, length, sum_):
+        if length == 1 or not sum_:
+            return self._get_full_mask()
+        return self.index.get_candidates(length, sum_)
+
+    def _get_full_mask(self):
+        return (1 << self.count_of_digits) - 2
+
+    @staticmethod
+    def _get_mask(digits):
+        mask = 0
+        for digit in digits:
+            if isinstance(digit, str):
+                digit = Kakuro._get_int_from_str(digit)
+            mask |= 1 << digit
+        return mask
 
     @staticmethod
-    def _get_combinations(sum_combs, count, numeral_system):
-        nums = list(range(1, numeral_system))
-        combs = []
-        for j in itertools.combinations(nums, count):
-            if sum(j) == sum_combs:
-                combs.append(list(j))
-        return combs
+    def _get_digits(mask):
+        digits = []
+        while mask:
+            lowest = mask & -mask
+            digits.append(lowest.bit_length() - 1)
+            mask ^= lowest
+        return digits
+
+    @staticmethod
+    def _count_digits(mask):
+        return bin(mask).count('1')
 
     def _set_single_possible_values(self, map_):
         for i in map_:
@@ -91,51 +190,551 @@ class Solver:
                         or not j.vert_length
                         or (not j.hor_sum and not j.vert_sum)):
                     continue
-                data = self._get_possible_values(j)
-                intersection_digits, union_digits = data
-                if intersection_digits:
-                    j.possible_values = intersection_digits
-                else:
-                    digits = Solver._get_range_digits(self.count_of_digits)
-                    union_digits = map(str, union_digits)
-                    uniq_digits = set(digits).difference(union_digits)
-                    j.possible_values = list(uniq_digits)
-                if len(j.possible_values) == 1:
+                domain = (self._get_line_mask(j.hor_length, j.hor_sum)
+                          & self._get_line_mask(j.vert_length, j.vert_sum))
+                if j.options_cell:
+                    domain &= Solver._get_mask(j.options_cell)
+                j.domain = domain
+                if Solver._count_digits(domain) == 1:
                     j.value = '[{0}]'.format(j.possible_values[0])
 
+    def reset(self):
+        self.count_results = 0
+        self.solutions = []
+        self.stats.reset()
+
     def print_solutions(self, kakuro, n=sys.maxsize):
-        self._set_single_possible_values(kakuro.map_)
-        startX, startY = Solver._find_next_empty_cell(kakuro.map_)
-        self._solve(kakuro, startX, startY, n)
-        for solution in self.solutions:
-            print(solution + '\n')
+        for solution in self.iter_solutions(kakuro, n):
+            print(kakuro.format_solution(solution) + '\n')
+
+    def solve(self, kakuro, n=sys.maxsize, prefix=()):
+        self.reset()
+        for solved in self._iter_timed(kakuro, n, prefix):
+            start = time.perf_counter()
+            self.solutions.append(str(solved))
+            self.stats.add_time('format', time.perf_counter() - start)
+        return self.solutions
+
+    def iter_solutions(self, kakuro, n=sys.maxsize, prefix=()):
+        self.reset()
+        for solved in self._iter_timed(kakuro, n, prefix):
+            yield solved.get_values()
+
+    def _iter_timed(self, kakuro, n, prefix):
+        elapsed = 0
+        start = time.perf_counter()
+        try:
+            for solved in self._iter_solved(kakuro, n, prefix):
+                elapsed += time.perf_counter() - start
+                yield solved
+                start = time.perf_counter()
+        finally:
+            elapsed += time.perf_counter() - start
+            self.stats.add_time('search',
+                                elapsed - self.stats.phases['prepare'])
+
+    def count_solutions(self, kakuro, limit=0):
+        self.reset()
+        self._start()
+        trail = []
+        self.memo = {}
+        start = time.perf_counter()
+        try:
+            if self._prepare(kakuro):
+                self.queue = None
+                cells = [j for i in kakuro.map_ for j in i
+                         if isinstance(j, Cell)]
+                self.count_results = self._count(cells, limit, trail)
+        except LimitExceeded:
+            self.limit_exceeded = True
+        finally:
+            Solver._undo(trail, 0)
+            self.queue = None
+            self.memo = None
+            self.stats.solutions = self.count_results
+            self.stats.add_time('search', time.perf_counter() - start
+                                - self.stats.phases['prepare'])
+        return self.count_results
+
+    def _count_by_iteration(self, kakuro, limit=0):
+        return sum(1 for _ in self.iter_solutions(kakuro, limit or -1))
+
+    def _start(self):
+        self.limit_exceeded = False
+        self.limit_reason = None
+        self.deadline = self.shared_deadline
+        self.reported_nodes = 0
+        if self.shared_nodes is not None:
+            self.shared_total = self.shared_nodes.value
+        if self.time_limit is not None:
+            deadline = time.monotonic() + self.time_limit
+            if self.deadline is None or deadline < self.deadline:
+                self.deadline = deadline
+
+    def _iter_solved(self, kakuro, n, prefix):
+        self._start()
+        trail = []
+        try:
+            solutions = ()
+            if not self.in_place:
+                start = time.perf_counter()
+                self._set_single_possible_values(kakuro.map_)
+                kakuro.reset_lines()
+                self.stats.add_time('prepare', time.perf_counter() - start)
+                startX, startY = Solver._find_next_empty_cell(kakuro.map_)
+                solutions = self._solve(kakuro, startX, startY, n)
+            elif (self._prepare(kakuro)
+                  and self._apply_prefix(kakuro, prefix, trail)):
+                self.queue = None
+                cells = [j for i in kakuro.map_ for j in i
+                         if isinstance(j, Cell)]
+                if self.decompose:
+                    solutions = self._iter_regions(kakuro, cells, n, trail)
+                else:
+                    solutions = self._iter_search(kakuro, cells, n, trail)
+            for solved in solutions:
+                self._add_solution()
+                yield solved
+                if self.count_results == n:
+                    return
+        except LimitExceeded:
+            self.limit_exceeded = True
+        except SearchCancelled:
+            pass
+        finally:
+            Solver._undo(trail, 0)
+            self.queue = None
+
+    def split(self, kakuro, count):
+        self.reset()
+        if not self._prepare(kakuro):
+            return []
+        prefixes = [()]
+        while len(prefixes) < count:
+            expanded = []
+            for prefix in prefixes:
+                expanded.extend(self._expand_prefix(kakuro, prefix))
+            if expanded == prefixes:
+                break
+            prefixes = expanded
+        self.queue = None
+        return prefixes
+
+    def _prepare(self, kakuro):
+        start = time.perf_counter()
+        try:
+            self._set_single_possible_values(kakuro.map_)
+            kakuro.reset_lines()
+            if not self._propagate(kakuro.lines[0] + kakuro.lines[1], []):
+                return False
+            cells = [j for i in kakuro.map_ for j in i
+                     if isinstance(j, Cell)]
+            self.queue = CellQueue(cells, self.heuristic)
+            return True
+        finally:
+            self.stats.add_time('prepare', time.perf_counter() - start)
+
+    def _apply_prefix(self, kakuro, prefix, trail):
+        for x, y, value in prefix:
+            cell = kakuro.map_[x][y]
+            if cell.value != '[*]':
+                if cell.value != '[{0}]'.format(
+                        Kakuro._get_str_from_int(value)):
+                    return False
+                continue
+            if not cell.domain & (1 << value):
+                return False
+            Solver._set_value(cell, value, trail, self.queue)
+            if not self._propagate([cell.hor_line, cell.vert_line], trail):
+                return False
+        return True
+
+    def _expand_prefix(self, kakuro, prefix):
+        trail = []
+        result = []
+        if self._apply_prefix(kakuro, prefix, trail):
+            cell = self.queue.pop()
+            if cell is None:
+                result.append(prefix)
+            else:
+                for value in Solver._get_digits(cell.domain):
+                    mark = len(trail)
+                    Solver._set_value(cell, value, trail, self.queue)
+                    if self._propagate([cell.hor_line, cell.vert_line],
+                                       trail):
+                        result.append(prefix + ((cell.y, cell.x, value),))
+                    Solver._undo(trail, mark, self.queue)
+                self.queue.push(cell)
+        Solver._undo(trail, 0, self.queue)
+        return result
+
+    def _add_solution(self):
+        self.count_results += 1
+        self.stats.add_solution()
+        if self.shared_count is not None:
+            with self.shared_count.get_lock():
+                self.shared_count.value += 1
+
+    def _check_limits(self, n):
+        self.limit_reason = self.get_limit_reason()
+        if self.limit_reason is not None:
+            raise LimitExceeded()
+        if self.shared_count is not None and 0 < n <= self.shared_count.value:
+            raise SearchCancelled()
+
+    def get_limit_reason(self):
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            return 'time'
+        if (self.node_limit is not None
+                and self._get_nodes() >= self.node_limit):
+            return 'nodes'
+        return None
+
+    def _get_nodes(self):
+        if self.shared_nodes is None:
+            return self.stats.nodes
+        if self.stats.nodes - self.reported_nodes >= NODE_BATCH:
+            self.report_nodes()
+        return self.shared_total + self.stats.nodes - self.reported_nodes
+
+    def report_nodes(self):
+        if self.shared_nodes is None:
+            return
+        with self.shared_nodes.get_lock():
+            self.shared_nodes.value += self.stats.nodes - self.reported_nodes
+            self.shared_total = self.shared_nodes.value
+        self.reported_nodes = self.stats.nodes
+
+    def _add_node(self, cell, value, consistent):
+        return self.stats.add_node((cell.y, cell.x), value, consistent)
 
     def _solve(self, original_kakuro, x, y, n):
         if self.count_results == n:
             return
-        for value in original_kakuro.map_[x][y].possible_values:
+        self._check_limits(n)
+        for value in Solver._get_digits(original_kakuro.map_[x][y].domain):
             kakuro = copy.deepcopy(original_kakuro)
             map_ = kakuro.map_
             Solver._set_value_to_cell(map_, x, y, value)
-            if not kakuro.check_lines():
+            if not self.stats.add_node((x, y), value, kakuro.check_lines()):
+                self.stats.check_lines_failures += 1
                 continue
             nextX, nextY = Solver._find_next_empty_cell(map_)
             if nextX == -1 and nextY == -1:
                 kakuro.map_ = map_
-                self.solutions.append(str(kakuro))
-                self.count_results += 1
+                yield kakuro
+                if self.count_results == n:
+                    return
+                continue
+            self.stats.depth += 1
+            yield from self._solve(kakuro, nextX, nextY, n)
+            self.stats.depth -= 1
+
+    def _iter_regions(self, kakuro, cells, n, trail):
+        components = Solver._get_components(cells)
+        if not components:
+            yield kakuro
+        elif len(components) > 1:
+            yield from self._iter_product(kakuro, components, n, trail)
+        else:
+            cell = Solver._find_cut(components[0])
+            if cell is None:
+                yield from self._iter_search(kakuro, components[0], n,
+                                             trail)
+                return
+            for value in Solver._get_digits(cell.domain):
+                mark = len(trail)
+                Solver._set_value(cell, value, trail)
+                if self._add_node(cell, value, self._propagate(
+                        [cell.hor_line, cell.vert_line], trail)):
+                    self.stats.depth += 1
+                    yield from self._iter_regions(kakuro, components[0], n,
+                                                  trail)
+                    self.stats.depth -= 1
+                Solver._undo(trail, mark)
+
+    def _iter_product(self, kakuro, components, n, trail):
+        cache = [None] * len(components)
+        return self._iter_factor(kakuro, components, 0, cache, n, trail)
+
+    def _iter_factor(self, kakuro, components, index, cache, n, trail):
+        if index == len(components):
+            yield kakuro
+            return
+        cells = components[index]
+        if cache[index] is None:
+            result = []
+            for _ in self._iter_regions(kakuro, cells, n, trail):
+                if index:
+                    result.append(tuple(map(lambda x: x.value, cells)))
+                yield from self._iter_factor(kakuro, components, index + 1,
+                                             cache, n, trail)
+                if [] in cache:
+                    return
+            cache[index] = result
+            return
+        for values in cache[index]:
+            self._check_limits(n)
+            mark = len(trail)
+            for cell, value in zip(cells, values):
+                trail.append((cell, 'value', cell.value))
+                cell.value = value
+            yield from self._iter_factor(kakuro, components, index + 1,
+                                         cache, n, trail)
+            Solver._undo(trail, mark)
+
+    def _iter_search(self, kakuro, cells, n, trail):
+        queue = self.queue
+        self.queue = CellQueue(cells, self.heuristic)
+        try:
+            cell = self.queue.pop()
+            if cell is None:
+                yield kakuro
+            else:
+                yield from self._solve_in_place(kakuro, cell, n, trail)
+        finally:
+            self.queue = queue
+
+    @staticmethod
+    def _find_cut(cells):
+        best = None
+        for cell in Solver._get_articulation_cells(cells):
+            parts = Solver._get_components([i for i in cells if i is not cell])
+            key = (max(map(len, parts)), Solver._count_digits(cell.domain))
+            if best is None or key < best[0]:
+                best = key, cell
+        if best is None:
+            return None
+        return best[1]
+
+    @staticmethod
+    def _get_articulation_cells(cells):
+        adjacency = {}
+        for cell in cells:
+            adjacency[cell] = [cell.hor_line, cell.vert_line]
+            for line in adjacency[cell]:
+                adjacency.setdefault(line, []).append(cell)
+        root = cells[0]
+        order = {root: 0}
+        low = {root: 0}
+        result = set()
+        children = 0
+        stack = [(root, None, iter(adjacency[root]))]
+        while stack:
+            node, parent, neighbours = stack[-1]
+            for i in neighbours:
+                if i is parent:
+                    continue
+                if i in order:
+                    low[node] = min(low[node], order[i])
+                else:
+                    order[i] = low[i] = len(order)
+                    stack.append((i, node, iter(adjacency[i])))
+                    break
+            else:
+                stack.pop()
+                if parent is root:
+                    children += 1
+                elif parent is not None:
+                    low[parent] = min(low[parent], low[node])
+                    if low[node] >= order[parent]:
+                        result.add(parent)
+        if children > 1:
+            result.add(root)
+        return [cell for cell in cells if cell in result]
+
+    def _solve_in_place(self, kakuro, cell, n, trail):
+        if self.count_results == n:
+            return
+        self._check_limits(n)
+        for value in Solver._get_digits(cell.domain):
+            mark = len(trail)
+            Solver._set_value(cell, value, trail, self.queue)
+            if not self._add_node(cell, value, self._propagate(
+                    [cell.hor_line, cell.vert_line], trail)):
+                Solver._undo(trail, mark, self.queue)
+                continue
+            next_cell = self.queue.pop()
+            if next_cell is None:
+                yield kakuro
+            else:
+                self.stats.depth += 1
+                yield from self._solve_in_place(kakuro, next_cell, n, trail)
+                self.stats.depth -= 1
+            Solver._undo(trail, mark, self.queue)
+            if self.count_results == n:
                 return
-            self._solve(kakuro, nextX, nextY, n)
-        return
+        self.queue.push(cell)
+
+    def _count(self, cells, limit, trail):
+        self._check_limits(0)
+        result = 1
+        for component in Solver._get_components(cells):
+            result *= self._count_component(component, limit, trail)
+            if not result:
+                return 0
+        if limit:
+            return min(result, limit)
+        return result
+
+    def _count_component(self, cells, limit, trail):
+        key = Solver._get_state_key(cells)
+        if key in self.memo:
+            return self.memo[key]
+        cell = min(cells, key=lambda x: Solver._count_digits(x.domain))
+        result = 0
+        for value in Solver._get_digits(cell.domain):
+            mark = len(trail)
+            Solver._set_value(cell, value, trail)
+            if self._add_node(cell, value, self._propagate(
+                    [cell.hor_line, cell.vert_line], trail)):
+                self.stats.depth += 1
+                result += self._count(cells, limit, trail)
+                self.stats.depth -= 1
+            Solver._undo(trail, mark)
+            if limit and result >= limit:
+                result = limit
+                break
+        self.memo[key] = result
+        return result
 
     @staticmethod
-    def _set_value_to_cell(map_, x, y, value):
-        value = str(value)
-        map_[x][y].value = '[{0}]'.format(value)
-        for i in map_[x][y].vert_neighbours:
-            i.possible_values = list(set(i.possible_values) - {value})
-        for i in map_[x][y].hor_neighbours:
-            i.possible_values = list(set(i.possible_values) - {value})
+    def _get_components(cells):
+        empty = set(cell for cell in cells if cell.value == '[*]')
+        order = dict(map(reversed, enumerate(cells)))
+        components = []
+        for cell in cells:
+            if cell not in empty:
+                continue
+            empty.discard(cell)
+            component = [cell]
+            for current in component:
+                for line in [current.hor_line, current.vert_line]:
+                    for i in line.cells:
+                        if i in empty:
+                            empty.discard(i)
+                            component.append(i)
+            components.append(sorted(component, key=order.get))
+        return components
+
+    @staticmethod
+    def _get_state_key(cells):
+        cells = sorted(cells, key=lambda x: (x.y, x.x))
+        lines = dict.fromkeys(itertools.chain.from_iterable(
+            map(lambda x: (x.hor_line, x.vert_line), cells)))
+        return (tuple(map(lambda x: (x, x.domain), cells)),
+                tuple(map(lambda x: (x, x.partial, x.used), lines)))
+
+    def _propagate(self, lines, trail):
+        queue = list(lines)
+        queued = set(queue)
+        while queue:
+            line = queue.pop()
+            queued.discard(line)
+            changed = self._narrow_line(line, trail)
+            if changed is None:
+                self.stats.check_lines_failures += 1
+                return False
+            for i in changed:
+                if i not in queued:
+                    queue.append(i)
+                    queued.add(i)
+        return True
+
+    def _narrow_line(self, line, trail):
+        if not line.is_consistent(self.count_of_digits):
+            return None
+        empty = [cell for cell in line.cells if cell.value == '[*]']
+        if not empty:
+            return []
+        allowed = 0
+        for cell in empty:
+            allowed |= cell.domain
+        possible, required = self.index.get_digits(
+            len(line.cells), line.sum_, line.used, allowed)
+        if Solver._count_digits(possible) < len(empty):
+            return None
+        domains = [cell.domain & possible for cell in empty]
+        for digit in Solver._get_digits(required):
+            bit = 1 << digit
+            holders = [i for i in range(len(empty)) if domains[i] & bit]
+            if not holders:
+                return None
+            if len(holders) == 1:
+                domains[holders[0]] = bit
+        changed = []
+        singles = []
+        for cell, domain in zip(empty, domains):
+            if not domain:
+                return None
+            if Solver._count_digits(domain) == 1:
+                singles.append(cell)
+            if domain != cell.domain:
+                self.stats.prunings += Solver._count_digits(
+                    cell.domain & ~domain)
+                trail.append((cell, 'domain', cell.domain))
+                cell.domain = domain
+                changed.extend([cell.hor_line, cell.vert_line])
+                if self.queue is not None:
+                    self.queue.update(cell)
+        for cell in singles:
+            if cell.value != '[*]':
+                continue
+            if not cell.domain:
+                return None
+            Solver._set_value(cell, Solver._get_digits(cell.domain)[0],
+                              trail, self.queue)
+            changed.extend([cell.hor_line, cell.vert_line])
+        return changed
+
+    @staticmethod
+    def _set_value_to_cell(map_, x, y, value, trail=None):
+        Solver._set_value(map_[x][y], value, trail)
+
+    @staticmethod
+    def _set_value(cell, value, trail=None, queue=None):
+        if isinstance(value, str):
+            value = Kakuro._get_int_from_str(value)
+        bit = 1 << value
+        is_empty = cell.value == '[*]'
+        if trail is not None:
+            trail.append((cell, 'value', cell.value))
+            for line in [cell.hor_line, cell.vert_line]:
+                if line is not None:
+                    trail.append((line, 'state', line.state))
+        cell.value = '[{0}]'.format(Kakuro._get_str_from_int(value))
+        for line in [cell.hor_line, cell.vert_line]:
+            if line is None:
+                continue
+            if is_empty:
+                line.add(value)
+            else:
+                line.reset()
+            if queue is not None:
+                queue.update_line(line)
+        for i in itertools.chain(*map(
+                lambda x: x.cells if x is not None else (),
+                [cell.vert_line, cell.hor_line])):
+            if i is not cell and i.domain & bit:
+                if trail is not None:
+                    trail.append((i, 'domain', i.domain))
+                i.domain &= ~bit
+                if queue is not None:
+                    queue.update(i)
+
+    @staticmethod
+    def _undo(trail, mark, queue=None):
+        while len(trail) > mark:
+            item, attr, value = trail.pop()
+            setattr(item, attr, value)
+            if queue is None:
+                continue
+            if attr == 'value':
+                queue.push(item)
+            elif attr == 'domain':
+                queue.update(item)
+            else:
+                queue.update_line(item)
 
     @staticmethod
     def _find_next_empty_cell(map_):
@@ -147,9 +746,8 @@ class Solver:
 
 
 class Cell:
-    def __init__(self, value, x, y, hor_neighbours,
-                 vert_neighbours, hor_sum=0, vert_sum=0,
-                 hor_length=0, vert_length=0):
+    def __init__(self, value, x, y, hor_sum=0, vert_sum=0, hor_length=0,
+                 vert_length=0):
         self.value = value
         self.x = x
         self.y = y
@@ -157,217 +755,333 @@ class Cell:
         self.vert_sum = vert_sum
         self.hor_length = hor_length
         self.vert_length = vert_length
-        self.possible_values = []
+        self.domain = 0
         self.options_cell = []
-        self.hor_neighbours = hor_neighbours
-        self.vert_neighbours = vert_neighbours
+        self.hor_line = None
+        self.vert_line = None
+
+    @property
+    def possible_values(self):
+        return list(map(Kakuro._get_str_from_int,
+                        Solver._get_digits(self.domain)))
+
+    @possible_values.setter
+    def possible_values(self, values):
+        self.domain = Solver._get_mask(values)
 
     def __str__(self):
         return self.value
 
 
+class Line:
+    def __init__(self, cells, sum_):
+        self.cells = cells
+        self.sum_ = sum_
+        self.partial = 0
+        self.filled = 0
+        self.used = 0
+        self.repeated = False
+
+    @property
+    def state(self):
+        return self.partial, self.filled, self.used, self.repeated
+
+    @state.setter
+    def state(self, state):
+        self.partial, self.filled, self.used, self.repeated = state
+
+    def add(self, digit):
+        bit = 1 << digit
+        self.repeated = self.repeated or bool(self.used & bit)
+        self.partial += digit
+        self.filled += 1
+        self.used |= bit
+
+    def reset(self):
+        self.state = (0, 0, 0, False)
+        for cell in self.cells:
+            if cell.value != '[*]':
+                self.add(Kakuro._get_int_from_str(cell.value[1:-1]))
+
+    def is_consistent(self, count_of_digits):
+        if self.repeated:
+            return False
+        if not self.sum_:
+            return True
+        low, high = Line._get_bounds(self.used,
+                                     len(self.cells) - self.filled,
+                                     count_of_digits)
+        return low <= self.sum_ - self.partial <= high
+
+    @staticmethod
+    @functools.lru_cache(maxsize=DIGITS_CACHE_SIZE)
+    def _get_bounds(used, count, count_of_digits):
+        free = [i for i in range(1, count_of_digits) if not used >> i & 1]
+        if count > len(free):
+            return 1, 0
+        return sum(free[:count]), sum(free[len(free) - count:])
+
+
+class CellQueue:
+    def __init__(self, cells, heuristic):
+        self.heuristic = heuristic
+        self.order = {}
+        self.keys = {}
+        self.heap = []
+        for cell in cells:
+            self.order[cell] = len(self.order)
+            self.push(cell)
+
+    def get_key(self, cell):
+        order = self.order[cell]
+        if self.heuristic == 'row':
+            return (order,)
+        size = Solver._count_digits(cell.domain)
+        if self.heuristic == 'mrv':
+            return size, order
+        if self.heuristic == 'degree':
+            degree = len(cell.hor_line.cells) + len(cell.vert_line.cells)
+            return size, -degree, order
+        free = (len(cell.hor_line.cells) - cell.hor_line.filled
+                + len(cell.vert_line.cells) - cell.vert_line.filled)
+        return size, free, order
+
+    def push(self, cell):
+        if cell.value != '[*]':
+            return
+        key = self.get_key(cell)
+        if self.keys.get(cell) == key:
+            return
+        self.keys[cell] = key
+        heapq.heappush(self.heap, (key, cell))
+        if len(self.heap) > 2 * len(self.keys) + QUEUE_SLACK:
+            self.heap = list(map(lambda x: (x[1], x[0]), self.keys.items()))
+            heapq.heapify(self.heap)
+
+    def update(self, cell):
+        if self.heuristic != 'row':
+            self.push(cell)
+
+    def update_line(self, line):
+        if self.heuristic == 'tight':
+            for cell in line.cells:
+                self.push(cell)
+
+    def pop(self):
+        while self.heap:
+            key, cell = heapq.heappop(self.heap)
+            if self.keys.get(cell) != key:
+                continue
+            del self.keys[cell]
+            if cell.value != '[*]':
+                continue
+            if key == self.get_key(cell):
+                return cell
+            self.push(cell)
+        return None
+
+
 class Kakuro:
-    def __init__(self, data, is_torus):
-        self.map_ = self._create_map(data)
-        if is_torus:
-            self._process_tor()
+    def __init__(self, data, is_torus, numeral_system=None):
+        self.is_torus = is_torus
+        self.map_, self.lines = Kakuro._parse(data, is_torus, numeral_system)
         self.width = len(self.map_[0])
         self.height = len(self.map_)
-        self.columns = self._create_columns()
-
-    def _create_columns(self):
-        columns = [[], []]
-        added_hor_cells = set()
-        added_ver_cells = set()
-        for row in self.map_:
-            for cell in row:
-                if isinstance(cell, Cell):
-                    if cell not in added_hor_cells:
-                        to_append = (cell.hor_neighbours + [cell])
-                        columns[0].append(to_append)
-                        added_hor_cells = added_hor_cells.union(columns[0][-1])
-                    if cell not in added_ver_cells:
-                        columns[1].append(cell.vert_neighbours + [cell])
-                        added_ver_cells = added_ver_cells.union(columns[1][-1])
-        return columns
+        self._set_line_sizes()
+
+    @staticmethod
+    def from_file(filename, is_torus, numeral_system=None):
+        with open(filename) as f:
+            return Kakuro(f, is_torus, numeral_system)
+
+    def _set_line_sizes(self):
+        for line in self.lines[0]:
+            for cell in line.cells:
+                cell.hor_sum = line.sum_
+                cell.hor_length = len(line.cells)
+        for line in self.lines[1]:
+            for cell in line.cells:
+                cell.vert_sum = line.sum_
+                cell.vert_length = len(line.cells)
+
+    def reset_lines(self):
+        for line in self.lines[0] + self.lines[1]:
+            line.reset()
 
     def __str__(self):
         return '\n'.join(map(Kakuro._format_line, self.map_))
 
-    @staticmethod
-    def _format_line(line):
-        return ''.join(map(lambda x: str(x).ljust(8), line)).rstrip()
+    def get_values(self):
+        return tuple(map(lambda x: tuple(map(Kakuro._get_value, x)),
+                         self.map_))
 
-    def _create_map(self, lines):
-        map_ = []
-        y = 0
-        for i in range(len(lines)):
-            lines[i] = lines[i].split()
-        vert_sums = list(itertools.repeat(0, len(lines[0])))
-        vert_lengths = copy.copy(vert_sums)
-        vert_neighbours = []
-        for i in range(len(lines[0])):
-            vert_neighbours.append([])
-        for line in lines:
-            Kakuro._process_line(
-                map_, y, line, vert_sums, vert_lengths, vert_neighbours)
-            y += 1
-        return map_
+    def format_solution(self, solution):
+        lines = map(lambda x: list(map(Kakuro._format_cell, *x)),
+                    zip(self.map_, solution))
+        return '\n'.join(map(Kakuro._format_line, lines))
 
     @staticmethod
-    def _process_line(map_, y, line, vert_sums, vert_lengths, vert_neighbours):
-        x = 0
-        map_.append([])
-        hor_sum = 0
-        hor_length = 0
-        hor_neighbours = []
-        for cell in line:
-            no_empty_cell = CELL_PATTERN.search(cell)
-            if cell == '[*]' or no_empty_cell:
-                if no_empty_cell:
-                    options_cell = no_empty_cell.group()[1:-1].split('-')
-                else:
-                    options_cell = []
-                data = Kakuro._process_empty_cell(
-                    map_,
-                    x,
-                    y,
-                    hor_length,
-                    vert_lengths[x],
-                    hor_neighbours,
-                    vert_neighbours,
-                    hor_sum,
-                    vert_sums[x],
-                    options_cell)
-                vert_lengths[x], hor_length = data
-            else:
-                map_[-1].append(cell)
-                if cell == '[-]':
-                    hor_sum = 0
-                    vert_sums[x] = 0
-                else:
-                    vert_sums[x], hor_sum = Kakuro._process_sums(cell, x, y)
-                vert_lengths[x] = 0
-                hor_length = 0
-                hor_neighbours = []
-                vert_neighbours[x] = []
-            x += 1
+    def _format_cell(cell, value):
+        if value is None:
+            return cell
+        if not value:
+            return '[*]'
+        return '[{0}]'.format(Kakuro._get_str_from_int(value))
 
     @staticmethod
-    def _process_empty_cell(map_,
-                            x,
-                            y,
-                            hor_length,
-                            vert_length,
-                            hor_neighbours,
-                            vert_neighbours,
-                            hor_sum,
-                            vert_sum,
-                            variants_cell):
-        hor_length += 1
-        vert_length += 1
-        map_[-1].append(Cell('[*]',
-                             x,
-                             y,
-                             copy.copy(hor_neighbours),
-                             copy.copy(vert_neighbours[x]),
-                             hor_sum,
-                             vert_sum,
-                             hor_length,
-                             vert_length))
-        map_[-1][-1].options_cell = variants_cell
-        Kakuro._add_neighbours(map_, x, y, HORIZONTAL, hor_length)
-        Kakuro._add_neighbours(map_, x, y, VERTICAL, vert_length)
-        hor_neighbours.append(map_[-1][-1])
-        vert_neighbours[x].append(map_[-1][-1])
-        return vert_length, hor_length
+    def _get_value(cell):
+        if not isinstance(cell, Cell):
+            return None
+        if cell.value == '[*]':
+            return 0
+        return Kakuro._get_int_from_str(cell.value[1:-1])
 
     @staticmethod
-    def _process_sums(cell, x, y):
-        sums = SUM_PATTERN.search(cell)
-        result = [0, 0]
-        if sums is None:
-            raise ValueError(
-                "Error: undefined cell '{}' ({},{})".format(cell, x, y))
-        for i in [1, 2]:
-            if sums.group(i) != '-':
-                result[i - 1] = int(sums.group(i))
-        return result
+    def _format_line(line):
+        return ''.join(map(lambda x: str(x).ljust(8), line)).rstrip()
 
     @staticmethod
-    def _add_neighbours(map_, x, y, direction, length):
-        dir_length = direction + '_length'
-        for i in range(1, length):
-            if direction == HORIZONTAL:
-                indice_1 = y
-                indice_2 = x - i
-            else:
-                indice_1 = y - i
-                indice_2 = x
-            setattr(map_[indice_1][indice_2], dir_length,
-                    getattr(map_[indice_1][indice_2], dir_length) + 1)
-            getattr(map_[indice_1][indice_2],
-                    direction + '_neighbours').append(map_[-1][-1])
-
-    def _process_tor(self):
-        self._process_direction_lines(HORIZONTAL)
-        self._process_direction_lines(VERTICAL)
-
-    def _process_direction_lines(self, direction):
-        attr = direction + '_sum'
-        for i in range(len(self.map_)):
-            if direction == VERTICAL:
-                cell_1 = self.map_[0][i]
-                cell_2 = self.map_[-1][i]
-            else:
-                cell_1 = self.map_[i][0]
-                cell_2 = self.map_[i][-1]
-            if (isinstance(cell_1, Cell) and isinstance(cell_2, Cell)):
-                if not getattr(cell_1, attr):
-                    setattr(cell_1, attr, getattr(cell_2, attr))
-                else:
-                    setattr(cell_2, attr, getattr(cell_1, attr))
-                Kakuro._exchange_neighbours(cell_1, cell_2, direction)
-                Kakuro._exchange_neighbours(cell_2, cell_1, direction)
-            elif (isinstance(cell_1, Cell)
-                  and cell_2 != '[*]'
-                  and cell_2 != '[-]'):
-                sums = SUM_PATTERN.search(cell_2)
-                if sums.group(2) != '-':
-                    setattr(cell_1, attr, int(sums.group(2)))
-                    for j in getattr(cell_1, direction + '_neighbours'):
-                        setattr(j, attr, getattr(cell_1, attr))
+    def _parse(data, is_torus=False, numeral_system=None):
+        map_ = []
+        lines = [[], []]
+        errors = []
+        width = None
+        vert_lines = []
+        vert_sums = []
+        first_vert_lines = []
+        merged = set()
+        for row in data:
+            tokens = row.split()
+            if not tokens:
+                continue
+            y = len(map_)
+            if width is None:
+                width = len(tokens)
+                vert_lines = [None] * width
+                vert_sums = [0] * width
+                first_vert_lines = [None] * width
+            elif len(tokens) != width:
+                errors.append('Error: row {0} has {1} cells instead of '
+                              '{2}'.format(y, len(tokens), width))
+            map_.append([])
+            hor_line = None
+            hor_sum = 0
+            for x, token in enumerate(tokens):
+                kind, value = Kakuro._parse_token(token, numeral_system)
+                if kind is None:
+                    errors.append("Error: undefined cell '{}' ({},{})".format(
+                        token, x, y))
+                if errors:
+                    continue
+                if kind == 'sums':
+                    map_[-1].append(token)
+                    vert_sums[x], hor_sum = value
+                    hor_line = None
+                    vert_lines[x] = None
+                    continue
+                cell = Cell('[*]', x, y)
+                cell.options_cell = value
+                if hor_line is None:
+                    hor_line = Line([], hor_sum)
+                    lines[0].append(hor_line)
+                if vert_lines[x] is None:
+                    vert_lines[x] = Line([], vert_sums[x])
+                    lines[1].append(vert_lines[x])
+                    if not y:
+                        first_vert_lines[x] = vert_lines[x]
+                cell.hor_line = hor_line
+                cell.vert_line = vert_lines[x]
+                hor_line.cells.append(cell)
+                vert_lines[x].cells.append(cell)
+                map_[-1].append(cell)
+            if is_torus and not errors:
+                first_cell = map_[-1][0]
+                if isinstance(first_cell, Cell):
+                    Kakuro._wrap_line(first_cell.hor_line, hor_line, hor_sum,
+                                      HORIZONTAL, merged)
+        if not map_ and not errors:
+            errors.append('Error: map is empty')
+        if errors:
+            raise MapFormatError(errors)
+        if is_torus:
+            for x in range(width):
+                Kakuro._wrap_line(first_vert_lines[x], vert_lines[x],
+                                  vert_sums[x], VERTICAL, merged)
+            if merged:
+                lines = list(map(lambda x: [i for i in x if i not in merged],
+                                 lines))
+        return map_, lines
 
     @staticmethod
-    def _exchange_neighbours(cell_1, cell_2, direction):
-        attr = direction + '_neighbours'
-        neighbours_1 = getattr(cell_1, attr)
-        neighbours_2 = getattr(cell_2, attr)
-        setattr(cell_1, attr, list(set(neighbours_1
-                                       + neighbours_2
-                                       + [cell_2]) - {cell_1}))
+    def _wrap_line(first_line, last_line, sum_, direction, merged):
+        if first_line is None or first_line is last_line:
+            return
+        if last_line is None:
+            first_line.sum_ = sum_
+            return
+        attr = direction + '_line'
+        for cell in first_line.cells:
+            setattr(cell, attr, last_line)
+        last_line.cells.extend(first_line.cells)
+        merged.add(first_line)
+
+    @staticmethod
+    def _parse_token(token, numeral_system=None):
+        if token == '[*]':
+            return 'cell', []
+        if token == '[-]':
+            return 'sums', (0, 0)
+        if len(token) < 3 or token[0] != '[' or token[-1] != ']':
+            return None, None
+        inner = token[1:-1]
+        if '\\' in inner:
+            sums = inner.split('\\')
+            if len(sums) != 2 or not all(0 < len(i) < 4 for i in sums):
+                return None, None
+            result = []
+            for i in sums:
+                if i == '-':
+                    result.append(0)
+                elif i.isdigit() and i.isascii():
+                    result.append(int(i))
+                else:
+                    return None, None
+            return 'sums', tuple(result)
+        options = inner.split('-')
+        if not all(len(i) == 1 and i.isalnum() and i.isascii()
+                   for i in options):
+            return None, None
+        if numeral_system is not None and not all(
+                0 < Kakuro._get_int_from_str(i) < numeral_system
+                for i in options):
+            return None, None
+        return 'cell', options
 
     def check_lines(self):
         return self._check_line(0) and self._check_line(1)
 
     def _check_line(self, direction):
-        for column in self.columns[direction]:
+        for line in self.lines[direction]:
+            if not line.sum_:
+                continue
             sum_ = 0
-            needBreak = False
-            for j in column:
-                if j.value[1:-1] == '*':
-                    needBreak = True
+            for cell in line.cells:
+                if cell.value == '[*]':
                     break
-                sum_ += Kakuro._get_int_from_str(j.value[1:-1])
-            if (((direction == 1 and sum_ != column[0].vert_sum
-                  and column[0].vert_sum)
-                or (not direction and sum_ != column[0].hor_sum
-                    and column[0].hor_sum)) and not needBreak):
-                return False
+                sum_ += Kakuro._get_int_from_str(cell.value[1:-1])
+            else:
+                if sum_ != line.sum_:
+                    return False
         return True
 
     @staticmethod
     def _get_int_from_str(string):
         if string.isdigit():
             return int(string)
-        return ord(string) - ord('a') + 10
+        return ord(string.lower()) - ord('a') + 10
+
+    @staticmethod
+    def _get_str_from_int(value):
+        if value < 10:
+            return str(value)
+        return chr(ord('a') + value - 10)
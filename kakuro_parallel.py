@@ -0,0 +1,74 @@
+import multiprocessing
+import sys
+import time
+from kakuro_logic import Kakuro, Solver, SearchStats
+from engines import create_solver
+
+SPLIT_FACTOR = 4
+
+worker = None
+
+
+def solve_parallel(data, is_torus, numeral_system, table=None,
+                   n=sys.maxsize, jobs=2, heuristic='row', engine='search'):
+    kakuro = Kakuro(list(data), is_torus)
+    return list(map(kakuro.format_solution, iter_parallel(
+        data, is_torus, numeral_system, table, n, jobs, heuristic, engine)))
+
+
+def iter_parallel(data, is_torus, numeral_system, table=None,
+                  n=sys.maxsize, jobs=2, heuristic='row', engine='search',
+                  time_limit=None, node_limit=None, progress=None):
+    deadline = None
+    if time_limit is not None:
+        deadline = time.monotonic() + time_limit
+    solver = Solver(numeral_system, table, heuristic=heuristic)
+    prefixes = solver.split(Kakuro(list(data), is_torus),
+                            jobs * SPLIT_FACTOR)
+    found = multiprocessing.Value('i', 0)
+    nodes = multiprocessing.Value('q', 0)
+    initargs = (data, is_torus, numeral_system, table, heuristic, engine,
+                found, deadline, node_limit, nodes)
+    count = 0
+    pool = multiprocessing.Pool(jobs, init_worker, initargs)
+    try:
+        tasks = map(lambda x: (x, n), prefixes)
+        for result, stats, limit_reason in pool.imap(solve_prefix, tasks):
+            if progress is not None:
+                progress['nodes'] = progress.get('nodes', 0) + stats.nodes
+                progress.setdefault('stats', SearchStats()).merge(stats)
+                if limit_reason is not None:
+                    progress.setdefault('limit_reason', limit_reason)
+            for solution in result:
+                if 0 < n <= count:
+                    return
+                count += 1
+                yield solution
+    finally:
+        pool.terminate()
+
+
+def init_worker(data, is_torus, numeral_system, table, heuristic, engine,
+                found, deadline=None, node_limit=None, nodes=None):
+    global worker
+    solver = create_solver(engine, numeral_system, table, heuristic=heuristic,
+                           node_limit=node_limit)
+    solver.shared_count = found
+    solver.shared_deadline = deadline
+    solver.shared_nodes = nodes
+    worker = (data, is_torus, solver)
+
+
+def solve_prefix(task):
+    prefix, n = task
+    data, is_torus, solver = worker
+    solver._start()
+    limit_reason = solver.get_limit_reason()
+    if limit_reason is not None:
+        return [], SearchStats(), limit_reason
+    try:
+        solutions = list(solver.iter_solutions(
+            Kakuro(list(data), is_torus), n, prefix))
+    finally:
+        solver.report_nodes()
+    return solutions, solver.stats, solver.limit_reason
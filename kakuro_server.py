@@ -0,0 +1,241 @@
+import argparse
+import asyncio
+import concurrent.futures
+import functools
+import json
+import os
+import signal
+import sys
+import kakuro
+import kakuro_batch
+import table_creator
+from kakuro_logic import Kakuro, HEURISTICS
+from engines import ENGINES, create_solver
+from solution_cache import SolutionCache
+
+HOST = '127.0.0.1'
+PORT = 8765
+MAX_REQUEST_SIZE = 1 << 20
+MODES = ['solve', 'count', 'unique']
+
+worker_config = None
+worker_solvers = {}
+worker_cache = None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--socket',
+                        help='Path of Unix socket (localhost TCP by default)')
+    parser.add_argument('--host', default=HOST, help='Host for TCP')
+    parser.add_argument('--port', type=int, default=PORT, help='Port for TCP')
+    parser.add_argument('--numSys', type=int, default=10,
+                        help='Numeral system')
+    parser.add_argument('--table', nargs=1,
+                        help='Name of table with combinations')
+    parser.add_argument('--heuristic', choices=HEURISTICS, default='row',
+                        help='Order of choosing cells during the search')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='Count of worker processes')
+    parser.add_argument('--max-requests', type=int,
+                        help='Count of requests solved at the same time '
+                             '(count of workers by default)')
+    parser.add_argument('--timeout', type=float,
+                        help='Time limit for one request in seconds')
+    parser.add_argument('--max-nodes', type=int,
+                        help='Limit of nodes of the search for one request')
+    parser.add_argument('--cache', action='store_true',
+                        help='Cache solutions in memory and on disk')
+    args = parser.parse_args()
+    if not 2 <= args.numSys <= table_creator.MAX_NUMERAL_SYSTEM:
+        parser.error('numeral system must be from 2 to {0}'.format(
+            table_creator.MAX_NUMERAL_SYSTEM))
+    table = None
+    if args.table is not None:
+        table = kakuro.load_table_or_exit(args.table[0], args.numSys)
+    jobs = max(args.jobs or 1, 1)
+    executor = create_executor(jobs, args.numSys, table, args.heuristic,
+                               args.cache)
+    try:
+        asyncio.run(serve(executor, args.socket, args.host, args.port,
+                          args.max_requests or jobs, args.timeout,
+                          args.max_nodes))
+    except OSError as e:
+        print(e, file=sys.stderr)
+        sys.exit(7)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown(cancel_futures=True)
+        if args.socket is not None and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+def create_executor(jobs, numeral_system, table=None, heuristic='row',
+                    cache=False):
+    return concurrent.futures.ProcessPoolExecutor(
+        jobs, initializer=init_worker,
+        initargs=(numeral_system, table, heuristic, cache))
+
+
+async def serve(executor, socket_path=None, host=HOST, port=PORT,
+                max_requests=1, time_limit=None, node_limit=None):
+    server = await start_server(executor, socket_path, host, port,
+                                max_requests, time_limit, node_limit)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in [signal.SIGINT, signal.SIGTERM]:
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except NotImplementedError:
+            pass
+    async with server:
+        await stop.wait()
+
+
+async def start_server(executor, socket_path=None, host=HOST, port=PORT,
+                       max_requests=1, time_limit=None, node_limit=None):
+    handler = functools.partial(handle_client, executor,
+                                asyncio.Semaphore(max_requests),
+                                time_limit, node_limit)
+    if socket_path is not None:
+        return await asyncio.start_unix_server(handler, socket_path,
+                                               limit=MAX_REQUEST_SIZE)
+    return await asyncio.start_server(handler, host, port,
+                                      limit=MAX_REQUEST_SIZE)
+
+
+async def handle_client(executor, semaphore, time_limit, node_limit,
+                        reader, writer):
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                response = {'status': 'error',
+                            'error': 'Error: request is too long'}
+                writer.write(format_response(response))
+                break
+            if not line:
+                break
+            response = await handle_request(executor, semaphore, line,
+                                            time_limit, node_limit)
+            writer.write(format_response(response))
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def handle_request(executor, semaphore, line, time_limit=None,
+                         node_limit=None):
+    try:
+        request = parse_request(line, time_limit, node_limit)
+    except ValueError as e:
+        return {'status': 'error', 'error': str(e)}
+    async with semaphore:
+        loop = asyncio.get_running_loop()
+        record = await loop.run_in_executor(executor, run_request, request)
+    if request['id'] is not None:
+        record['id'] = request['id']
+    return record
+
+
+def format_response(response):
+    return (json.dumps(response, sort_keys=True) + '\n').encode()
+
+
+def parse_request(line, time_limit=None, node_limit=None):
+    try:
+        request = json.loads(line)
+    except ValueError:
+        raise ValueError('Error: request is not valid JSON')
+    if not isinstance(request, dict):
+        raise ValueError('Error: request must be a JSON object')
+    data = request.get('map')
+    if isinstance(data, str):
+        data = data.rstrip().split('\n')
+    if (not isinstance(data, list) or not data
+            or not all(isinstance(i, str) for i in data)):
+        raise ValueError('Error: map must be a string or a list of strings')
+    mode = request.get('mode', 'solve')
+    if mode not in MODES:
+        raise ValueError("Error: undefined mode '{}'".format(mode))
+    engine = request.get('engine', 'search')
+    if engine not in ENGINES:
+        raise ValueError("Error: undefined engine '{}'".format(engine))
+    n = request.get('n', 1)
+    if not isinstance(n, int) or isinstance(n, bool):
+        raise ValueError('Error: n must be an integer')
+    return {'id': request.get('id'),
+            'data': data,
+            'is_torus': bool(request.get('torus', False)),
+            'mode': mode,
+            'engine': engine,
+            'n': n,
+            'time_limit': get_budget(request, 'timeout', time_limit),
+            'node_limit': get_budget(request, 'max_nodes', node_limit)}
+
+
+def get_budget(request, name, default=None):
+    value = request.get(name)
+    if value is None:
+        return default
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        raise ValueError('Error: {0} must be a number'.format(name))
+    if default is not None:
+        return min(value, default)
+    return value
+
+
+def init_worker(numeral_system, table, heuristic, cache=False):
+    global worker_config, worker_cache
+    worker_config = (numeral_system, table, heuristic)
+    worker_cache = SolutionCache.with_default_dir() if cache else None
+    worker_solvers.clear()
+    get_solver('search')
+
+
+def get_solver(engine):
+    if engine not in worker_solvers:
+        numeral_system, table, heuristic = worker_config
+        worker_solvers[engine] = create_solver(engine, numeral_system, table,
+                                               heuristic=heuristic)
+    return worker_solvers[engine]
+
+
+def run_request(request):
+    solver = get_solver(request['engine'])
+    solver.time_limit = request['time_limit']
+    solver.node_limit = request['node_limit']
+    if request['mode'] == 'solve':
+        return kakuro_batch.solve_puzzle(solver, request['data'],
+                                         request['is_torus'], request['n'],
+                                         cache=worker_cache)
+    try:
+        kakuro_ = Kakuro(request['data'], request['is_torus'],
+                         solver.count_of_digits)
+    except ValueError as e:
+        return {'status': 'invalid', 'error': str(e), 'count': 0}
+    limit = 2 if request['mode'] == 'unique' else max(request['n'], 0)
+    if solver.time_limit is None and solver.node_limit is None:
+        count = solver.count_solutions(kakuro_, limit)
+    else:
+        count = sum(1 for _ in solver.iter_solutions(kakuro_, limit or -1))
+    if solver.limit_reason == 'nodes':
+        status = 'node_limit'
+    elif solver.limit_exceeded:
+        status = 'timeout'
+    elif count:
+        status = 'solved'
+    else:
+        status = 'no_solutions'
+    record = {'status': status, 'count': count, 'nodes': solver.stats.nodes}
+    if request['mode'] == 'unique' and status == 'solved':
+        record['unique'] = count == 1
+    return record
+
+
+if __name__ == '__main__':
+    main()
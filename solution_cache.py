@@ -0,0 +1,139 @@
+import collections
+import hashlib
+import json
+import os
+import sys
+from combination_index import CombinationIndex
+from kakuro_logic import Cell, Solver, SUM_PATTERN
+
+MAX_SIZE = 1024
+
+
+class SolutionCache:
+    def __init__(self, maxsize=MAX_SIZE, cache_dir=None, transpose=True):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.transpose = transpose
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def with_default_dir(maxsize=MAX_SIZE, transpose=True):
+        cache_dir = CombinationIndex.get_cache_dir()
+        if cache_dir is not None:
+            cache_dir = os.path.join(cache_dir, 'solutions')
+        return SolutionCache(maxsize, cache_dir, transpose)
+
+    def solve(self, solver, kakuro, n=sys.maxsize):
+        key, transposed = self.get_key(kakuro, solver.count_of_digits)
+        solutions = self.get(key, n)
+        if solutions is not None:
+            self.hits += 1
+            if transposed:
+                solutions = list(map(SolutionCache._transpose, solutions))
+            return solutions, True
+        self.misses += 1
+        solutions = list(solver.iter_solutions(kakuro, n))
+        complete = not solver.limit_exceeded and not 0 < n <= len(solutions)
+        canonical = solutions
+        if transposed:
+            canonical = list(map(SolutionCache._transpose, solutions))
+        self.put(key, canonical, complete)
+        return solutions, False
+
+    def get_key(self, kakuro, numeral_system):
+        text = SolutionCache._get_text(kakuro.map_)
+        transposed = False
+        if self.transpose:
+            transposed_text = SolutionCache._get_text(
+                list(zip(*kakuro.map_)), True)
+            if transposed_text < text:
+                text = transposed_text
+                transposed = True
+        header = '{0} {1}\n'.format(numeral_system, int(kakuro.is_torus))
+        key = hashlib.sha256((header + text).encode()).hexdigest()
+        return key, transposed
+
+    def get(self, key, n=sys.maxsize):
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self._load(key)
+            if entry is None:
+                return None
+            self._add(key, entry)
+        else:
+            self.entries.move_to_end(key)
+        solutions, complete = entry
+        if n <= 0:
+            return list(solutions) if complete else None
+        if complete or n <= len(solutions):
+            return list(solutions[:n])
+        return None
+
+    def put(self, key, solutions, complete):
+        entry = self.entries.get(key)
+        if entry is not None and (entry[1] or (
+                len(entry[0]) >= len(solutions) and not complete)):
+            return
+        entry = (tuple(solutions), complete)
+        self._add(key, entry)
+        self._save(key, entry)
+
+    def _add(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def _get_filename(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def _load(self, key):
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._get_filename(key)) as f:
+                data = json.load(f)
+            solutions = tuple(map(
+                lambda x: tuple(map(tuple, x)), data['solutions']))
+            return solutions, bool(data['complete'])
+        except (IOError, ValueError, KeyError, TypeError):
+            return None
+
+    def _save(self, key, entry):
+        if self.cache_dir is None:
+            return
+        filename = self._get_filename(key)
+        temp_filename = '{0}.{1}.tmp'.format(filename, os.getpid())
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_filename, 'w') as f:
+                json.dump({'solutions': entry[0], 'complete': entry[1]}, f)
+            os.replace(temp_filename, filename)
+        except OSError:
+            return
+
+    @staticmethod
+    def _get_text(map_, transposed=False):
+        return '\n'.join(map(lambda x: ' '.join(map(
+            lambda y: SolutionCache._get_cell_text(y, transposed), x)), map_))
+
+    @staticmethod
+    def _get_cell_text(cell, transposed=False):
+        if isinstance(cell, Cell):
+            if not cell.options_cell:
+                return '*'
+            return '*{0}'.format(Solver._get_mask(cell.options_cell))
+        sums = SUM_PATTERN.search(cell)
+        if sums is None or sums.groups() == ('-', '-'):
+            return '-'
+        sums = list(map(lambda x: str(int(x)) if x != '-' else '-',
+                        sums.groups()))
+        if transposed:
+            sums.reverse()
+        return '\\'.join(sums)
+
+    @staticmethod
+    def _transpose(solution):
+        return tuple(zip(*solution))
@@ -1,8 +1,14 @@
 import sys
-import itertools
 import argparse
+import struct
 from collections import defaultdict
 
+MAX_NUMERAL_SYSTEM = 36
+BINARY_MAGIC = b'KKRT'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sHHHHI')
+BINARY_ENTRY = struct.Struct('<IIQQ')
+
 
 def write_table(table, count, output_name):
     with open(output_name, 'w') as f:
@@ -15,6 +21,37 @@ def write_stdout(table, count):
         print(combine_part(table, i, count))
 
 
+def write_binary_table(table, numeral_system, output):
+    max_length = numeral_system - 1
+    max_sum = numeral_system * (numeral_system - 1) // 2
+    full_mask = (1 << numeral_system) - 2
+    entries = []
+    combs = []
+    for length in range(max_length + 1):
+        for sum_ in range(max_sum + 1):
+            masks = list(map(get_mask, table.get((length, sum_), [])))
+            used = full_mask if masks else 0
+            current = 0
+            for mask in masks:
+                used &= mask
+                current |= mask
+            entries.append(BINARY_ENTRY.pack(
+                len(combs), len(masks), full_mask & ~current, used))
+            combs.extend(masks)
+    output.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION,
+                                    numeral_system, max_length, max_sum,
+                                    len(combs)))
+    output.write(b''.join(entries))
+    output.write(struct.pack('<{0}Q'.format(len(combs)), *combs))
+
+
+def get_mask(nums):
+    mask = 0
+    for num in nums:
+        mask |= 1 << num
+    return mask
+
+
 def combine_part(table, i, count):
     used, eliminated = find_regular_nums(table[i], count)
     used = ''.join(map(str, used))
@@ -27,18 +64,42 @@ def combine_part(table, i, count):
 
 
 def create_table(count):
-    nums = list(range(1, count))
     table = defaultdict(list)
     for i in range(1, count):
-        for j in itertools.combinations(nums, i):
-            table[(i, sum(j))].append(list(j))
+        min_sum = i * (i + 1) // 2
+        max_sum = (2 * count - i - 1) * i // 2
+        for j in range(min_sum, max_sum + 1):
+            table[(i, j)] = find_combinations(i, j, count)
     return table
 
 
+def find_combinations(length, sum_, numeral_system):
+    return list(iter_combinations(length, sum_, numeral_system))
+
+
+def iter_combinations(length, sum_, numeral_system, start=1):
+    if not length:
+        if not sum_:
+            yield []
+        return
+    rest = length - 1
+    high = numeral_system - 1
+    max_rest = rest * high - rest * (rest - 1) // 2
+    for digit in range(start, high - rest + 1):
+        min_rest = rest * digit + rest * (rest + 1) // 2
+        if sum_ - digit < min_rest:
+            break
+        if sum_ - digit > max_rest:
+            continue
+        for tail in iter_combinations(rest, sum_ - digit, numeral_system,
+                                      digit + 1):
+            yield [digit] + tail
+
+
 def replace_nums(nums):
     for i in range(len(nums)):
         if nums[i] >= 10:
-            nums[i] = chr(ord('a') + nums[i] % 10)
+            nums[i] = chr(ord('a') + nums[i] - 10)
     return nums
 
 
@@ -60,11 +121,22 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--name', nargs=1, help='Output filename')
     parser.add_argument('--numSys', nargs=1, type=int, help='Numeral system')
+    parser.add_argument('--binary', action='store_true',
+                        help='Write table in binary format')
     args = vars(parser.parse_args())
     if args['numSys'] is not None:
         count = args['numSys'][0]
+    if not 2 <= count <= MAX_NUMERAL_SYSTEM:
+        parser.error('numeral system must be from 2 to {0}'.format(
+            MAX_NUMERAL_SYSTEM))
     table = create_table(count)
-    if args['name'] is not None:
+    if args['binary']:
+        if args['name'] is not None:
+            with open(args['name'][0], 'wb') as f:
+                write_binary_table(table, count, f)
+        else:
+            write_binary_table(table, count, sys.stdout.buffer)
+    elif args['name'] is not None:
         write_table(table, count - 1, args['name'][0])
     else:
         write_stdout(table, count - 1)
@@ -1,13 +1,49 @@
 import unittest
+import atexit
+import asyncio
 import os
 import sys
-from io import StringIO
+import itertools
+import functools
+import json
+import random
+import pickle
+import shutil
+import tempfile
+from io import BytesIO, StringIO
 
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
                              os.path.pardir))
-from kakuro_logic import Cell, Solver, Kakuro
+from kakuro_logic import (Cell, CellQueue, Solver, Kakuro, MapFormatError,
+                          NODE_BATCH, QUEUE_SLACK)
+from combination_index import (CombinationIndex, LazyCombinations,
+                               DIGITS_CACHE_SIZE, MAX_STORED_COMBINATIONS)
 import table_creator
 import kakuro
+import kakuro_batch
+import kakuro_parallel
+from compact_kakuro import CompactKakuro, CompactSolver
+from exact_cover import DancingLinks, ExactCoverSolver
+from engines import create_solver
+import benchmark
+import kakuro_server
+from solution_cache import SolutionCache
+import kakuro_generator
+
+
+def setUpModule():
+    global cache_dir, old_cache_dir
+    cache_dir = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, cache_dir, True)
+    old_cache_dir = os.environ.get('KAKURO_CACHE_DIR')
+    os.environ['KAKURO_CACHE_DIR'] = cache_dir
+
+
+def tearDownModule():
+    if old_cache_dir is None:
+        del os.environ['KAKURO_CACHE_DIR']
+    else:
+        os.environ['KAKURO_CACHE_DIR'] = old_cache_dir
 
 
 class TableCreatorTest(unittest.TestCase):
@@ -25,11 +61,47 @@ class TableCreatorTest(unittest.TestCase):
         expected_result.append('a')
         self.assertEqual(actual_result, expected_result)
 
+    def test_replace_nums_large(self):
+        nums = table_creator.replace_nums([19, 20, 35])
+        self.assertEqual(nums, ['j', 'k', 'z'])
+
+    def test_iter_combinations(self):
+        for count in range(2, 9):
+            for length in range(count):
+                for sum_ in range(count * count // 2 + 1):
+                    expected_result = list(map(list, filter(
+                        lambda x: sum(x) == sum_,
+                        itertools.combinations(range(1, count), length))))
+                    actual_result = list(table_creator.iter_combinations(
+                        length, sum_, count))
+                    self.assertEqual(actual_result, expected_result)
+
+    def test_find_combinations_large(self):
+        actual_result = table_creator.find_combinations(17, 34 * 35 // 2 - 1,
+                                                        36)
+        self.assertEqual(actual_result, [])
+        actual_result = table_creator.find_combinations(3, 102, 36)
+        self.assertEqual(actual_result, [[33, 34, 35]])
+
     def test_find_regular_nums(self):
         actual_result = table_creator.find_regular_nums([[1, 2], [2, 3]], 2)
         self.assertEqual([2], actual_result[0])
         self.assertEqual([], actual_result[1])
 
+    def test_write_binary_table(self):
+        table = table_creator.create_table(4)
+        output = BytesIO()
+        table_creator.write_binary_table(table, 4, output)
+        data = output.getvalue()
+        header = table_creator.BINARY_HEADER.unpack_from(data)
+        self.assertEqual(header, (b'KKRT', 1, 4, 3, 6, 7))
+        offset = (table_creator.BINARY_HEADER.size
+                  + (2 * 7 + 4) * table_creator.BINARY_ENTRY.size)
+        entry = table_creator.BINARY_ENTRY.unpack_from(data, offset)
+        self.assertEqual(entry, (4, 1, 0b0100, 0b1010))
+        self.assertEqual(len(data), table_creator.BINARY_HEADER.size
+                         + 4 * 7 * table_creator.BINARY_ENTRY.size + 7 * 8)
+
     def test_create_table(self):
         actual_result = table_creator.create_table(4)
         self.assertEqual([[1, 2]], actual_result[(2, 3)])
@@ -44,6 +116,146 @@ class TableCreatorTest(unittest.TestCase):
         self.assertEqual(expected_result, actual_result)
 
 
+class CombinationIndexTest(unittest.TestCase):
+    def test_for_numeral_system(self):
+        index = CombinationIndex.for_numeral_system(10)
+        self.assertIs(index, CombinationIndex.for_numeral_system(10))
+        self.assertEqual(index.get_combinations(3, 8),
+                         [0b100110, 0b11010])
+        self.assertEqual(index.get_combinations(2, 30), [])
+
+    def test_from_table(self):
+        table = kakuro.load_table('tests/test_table.txt')
+        index = CombinationIndex.from_table(table, 5)
+        self.assertEqual(index.get_combinations(1, 2), [0b100])
+
+    def test_from_binary(self):
+        sys.argv[1:] = ['--name', 'tests/test_create_table.bin',
+                        '--numSys', '10', '--binary']
+        table_creator.main()
+        index = kakuro.load_table('tests/test_create_table.bin')
+        self.assertIsInstance(index, CombinationIndex)
+        self.assertEqual(index.numeral_system, 10)
+        expected_index = CombinationIndex.for_numeral_system(10)
+        for length in range(11):
+            for sum_ in range(50):
+                self.assertEqual(
+                    list(index.get_combinations(length, sum_)),
+                    expected_index.get_combinations(length, sum_))
+                self.assertEqual(index.get_digits(length, sum_),
+                                 expected_index.get_digits(length, sum_))
+        index = pickle.loads(pickle.dumps(index))
+        self.assertEqual(list(index.get_combinations(3, 8)),
+                         [0b100110, 0b11010])
+        self.assertEqual(Solver(10, index).index, index)
+        os.remove('tests/test_create_table.bin')
+
+    def test_lazy_combinations(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            combinations = LazyCombinations(10, cache_dir)
+            self.assertEqual(combinations.combinations, {})
+            self.assertEqual(combinations.get((3, 8)), [0b100110, 0b11010])
+            self.assertEqual(combinations.get((3, 5), []), [])
+            self.assertEqual(combinations.get((10, 45), []), [])
+            self.assertEqual(list(combinations.combinations), [(3, 8)])
+            combinations.save()
+            self.assertFalse(combinations.dirty)
+            combinations = LazyCombinations(10, cache_dir)
+            self.assertEqual(combinations.combinations,
+                             {(3, 8): [0b100110, 0b11010]})
+            self.assertFalse(combinations.dirty)
+            self.assertEqual(LazyCombinations(16, cache_dir).combinations,
+                             {})
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_lazy_combinations_corrupt(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(cache_dir, 'combinations-10.json')
+            for text in ['{', '[]', '{"numeral_system": 10}',
+                         '{"numeral_system": 10, "combinations": {"3": [1]}}',
+                         '{"numeral_system": 10, '
+                         '"combinations": {"3,8": ["x"]}}']:
+                with open(filename, 'w') as f:
+                    f.write(text)
+                combinations = LazyCombinations(10, cache_dir)
+                self.assertEqual(combinations.combinations, {})
+                self.assertEqual(combinations.get((3, 8)),
+                                 [0b100110, 0b11010])
+                combinations.save()
+                self.assertEqual(LazyCombinations(10, cache_dir).combinations,
+                                 {(3, 8): [0b100110, 0b11010]})
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_get_cache_dir(self):
+        old_value = os.environ.get('KAKURO_CACHE_DIR')
+        try:
+            os.environ['KAKURO_CACHE_DIR'] = ''
+            self.assertIsNone(CombinationIndex.get_cache_dir())
+            os.environ['KAKURO_CACHE_DIR'] = 'cache'
+            self.assertEqual(CombinationIndex.get_cache_dir(), 'cache')
+        finally:
+            if old_value is None:
+                del os.environ['KAKURO_CACHE_DIR']
+            else:
+                os.environ['KAKURO_CACHE_DIR'] = old_value
+
+    def test_reachable_digits(self):
+        index = CombinationIndex(12, LazyCombinations(12))
+        rng = random.Random(12)
+        for _ in range(500):
+            length, sum_ = rng.randint(1, 11), rng.randint(1, 66)
+            used, allowed = [sum(1 << i for i in range(1, 12)
+                                 if rng.random() < x) for x in [0.15, 0.7]]
+            self.assertEqual(
+                index._get_reachable_digits(length, sum_, used, allowed),
+                index.get_digits.__wrapped__(index, length, sum_, used,
+                                             allowed))
+        combinations = LazyCombinations(36)
+        self.assertEqual(combinations.count_combinations(3, 8), 2)
+        self.assertGreater(combinations.count_combinations(12, 216),
+                           MAX_STORED_COMBINATIONS)
+        index = CombinationIndex(36, combinations)
+        self.assertEqual(index.get_digits(12, 216, 1 << 35),
+                         (index.full_mask & ~(1 << 35), 0))
+        self.assertEqual(combinations.combinations, {})
+
+    def test_get_digits_cache(self):
+        get_digits = CombinationIndex.get_digits
+        CombinationIndex.get_digits = functools.lru_cache(maxsize=8)(
+            get_digits.__wrapped__)
+        try:
+            index = CombinationIndex(10, LazyCombinations(10))
+            for length, sum_, used in itertools.product(
+                    range(2, 5), range(3, 30, 3), [0, 1 << 1, 1 << 9]):
+                self.assertEqual(
+                    index.get_digits(length, sum_, used),
+                    get_digits.__wrapped__(index, length, sum_, used))
+                self.assertEqual(index.get_candidates(length, sum_, used),
+                                 index.get_digits(length, sum_, used)[0])
+                info = CombinationIndex.get_digits.cache_info()
+                self.assertLessEqual(info.currsize, 8)
+            self.assertGreater(info.misses, 8)
+            self.assertEqual(info.currsize, 8)
+        finally:
+            CombinationIndex.get_digits = get_digits
+        self.assertEqual(get_digits.cache_info().maxsize, DIGITS_CACHE_SIZE)
+
+    def test_get_candidates(self):
+        index = CombinationIndex.for_numeral_system(10)
+        self.assertEqual(index.get_candidates(3, 8), 0b111110)
+        self.assertEqual(index.get_candidates(3, 8, 1 << 2), 0b100010)
+        self.assertEqual(index.get_candidates(3, 8, 0, 0b11010), 0b11010)
+        self.assertEqual(index.get_candidates(3, 8, 1 << 1, 0b100100),
+                         0b100100)
+        self.assertEqual(index.get_candidates(3, 8, 1 << 6), 0)
+        self.assertEqual(index.get_candidates(3, 0, 1 << 6, 0b1100000),
+                         0b100000)
+
+
 class SolverTest(unittest.TestCase):
     def test_main(self):
         sys.argv[1:] = ['maps/mapKakuro2.txt',
@@ -114,22 +326,6 @@ class SolverTest(unittest.TestCase):
         Solver._set_value_to_cell(kakuro.map_, 1, 2, 6)
         self.assertEqual(Solver._find_next_empty_cell(kakuro.map_), (-1, -1))
 
-    def test_get_possible_values(self):
-        cell = Cell('*', 0, 0, [], [], 15, 7, 2, 2)
-        solver = Solver(10, False)
-        intersection_digits, union_digits = solver._get_possible_values(cell)
-        self.assertEqual(intersection_digits, [])
-        self.assertEqual(union_digits, [1, 2, 3, 4, 5, 7, 8, 9])
-
-    def test_get_regular_nums(self):
-        solver = Solver(10, False)
-        eliminated_digits, used_digits = solver._get_regular_nums(2, 15)
-        self.assertEqual(eliminated_digits, [1, 2, 3, 4, 5])
-        self.assertEqual(used_digits, [])
-        eliminated_digits, used_digits = solver._get_regular_nums(2, 7)
-        self.assertEqual(eliminated_digits, [8, 9, 7])
-        self.assertEqual(used_digits, [])
-
     def test_set_value_to_cell(self):
         input_ = ['[-\\36] [*] [*] [*] [*] [*] [*] [*] [*]']
         kakuro = Kakuro(input_, False)
@@ -142,6 +338,15 @@ class SolverTest(unittest.TestCase):
                                  expected_result)
             solver._set_value_to_cell(kakuro.map_, 0, 1 + j, 8 - j)
 
+    def test_domain_masks(self):
+        cell = Cell('[*]', 0, 0)
+        cell.possible_values = ['1', 3, 'a', 'F']
+        self.assertEqual(cell.domain, 0b1000010000001010)
+        self.assertEqual(cell.possible_values, ['1', '3', 'a', 'f'])
+        self.assertEqual(Solver._get_digits(cell.domain), [1, 3, 10, 15])
+        self.assertEqual(Solver._count_digits(cell.domain), 4)
+        self.assertEqual(Solver(16)._get_full_mask(), 0xfffe)
+
     def test_set_single_possible_values(self):
         input_ = ['[-] [11\\-] [7\\-]',
                   '[-\\15] [*] [*]',
@@ -182,6 +387,56 @@ class SolverTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             kakuro = Kakuro(input_, False)
 
+    def test_create_map_errors(self):
+        input_ = ['[-] [13\\-] [7\\-]',
+                  '[-\\15\\13] [*] [*]',
+                  '[-\\5] [*] [?]',
+                  '[-] [*]']
+        with self.assertRaises(MapFormatError) as context:
+            Kakuro(input_, False)
+        self.assertEqual(context.exception.errors, [
+            "Error: undefined cell '[-\\15\\13]' (0,1)",
+            "Error: undefined cell '[?]' (2,2)",
+            'Error: row 3 has 2 cells instead of 3'])
+        with self.assertRaises(MapFormatError):
+            Kakuro(['', ' '], False)
+
+    def test_create_map_options(self):
+        input_ = ['[-] [13\\-] [7\\-]',
+                  '[-\\15] [*] [z]',
+                  '[-\\5] [0] [*]']
+        with self.assertRaises(MapFormatError) as context:
+            Kakuro(input_, False, 10)
+        self.assertEqual(context.exception.errors, [
+            "Error: undefined cell '[z]' (2,1)",
+            "Error: undefined cell '[0]' (1,2)"])
+        input_[2] = '[-\\5] [*] [*]'
+        self.assertEqual(Kakuro(input_, False, 36).map_[1][2].options_cell,
+                         ['z'])
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'map.txt')
+            with open(filename, 'w') as f:
+                f.write('\n'.join(input_))
+            sys.argv[1:] = [filename]
+            sys.stderr = StringIO()
+            with self.assertRaises(SystemExit) as e:
+                kakuro.main()
+            self.assertEqual(e.exception.code, 8)
+            self.assertIn("undefined cell '[z]'", sys.stderr.getvalue())
+
+    def test_create_map_from_file(self):
+        input_ = StringIO('[-] [13\\-] [7\\-]\n\n'
+                          '[-\\15] [*] [*]\n'
+                          '[-\\5] [*] [*]\n')
+        kakuro = Kakuro(input_, False)
+        self.assertEqual((kakuro.width, kakuro.height), (3, 3))
+        self.assertEqual(list(map(lambda x: x.sum_, kakuro.lines[0])),
+                         [15, 5])
+        self.assertEqual(kakuro.map_[2][2].vert_length, 2)
+        solutions = list(Solver(10).iter_solutions(kakuro))
+        self.assertEqual(solutions, [((None, None, None), (None, 9, 6),
+                                      (None, 4, 1))])
+
     def test_solve2x2(self):
         input_ = ['[-] [13\\-] [7\\-]',
                   '[-\\15] [*] [*]',
@@ -212,6 +467,367 @@ class SolverTest(unittest.TestCase):
         expected_result2 += '[3\\-]   [6\\-]\n[-\\6]   [1]     [5]'
         self.assertTrue(out == expected_result1 or out == expected_result2)
 
+    def test_solve_tor_wrap(self):
+        input_ = ['[*] [*] [-\\3]',
+                  '[*] [*] [-\\7]',
+                  '[-] [-] [-]',
+                  '[4\\-] [6\\-] [-]']
+        kakuro = Kakuro(input_, True)
+        self.assertEqual(list(map(lambda x: (x.sum_, len(x.cells)),
+                                  kakuro.lines[1])), [(4, 2), (6, 2)])
+        self.assertEqual(kakuro.map_[1][0].vert_sum, 4)
+        actual_result = Solver(10).solve(kakuro, -1)
+        expected_result = ['[1]     [2]     [-\\3]\n[3]     [4]     [-\\7]\n'
+                           '[-]     [-]     [-]\n[4\\-]   [6\\-]   [-]']
+        self.assertEqual(actual_result, expected_result)
+        input_ = ['[*] [-\\5] [*] [*] [*] [-\\7] [*] [*]',
+                  '[*] [*] [*] [*] [*] [*] [*] [*]']
+        kakuro = Kakuro(input_, True)
+        self.assertEqual(list(map(lambda x: (x.sum_, len(x.cells)),
+                                  kakuro.lines[0])), [(5, 3), (7, 3), (0, 8)])
+        self.assertEqual(list(map(lambda x: (x.x, x.y),
+                                  kakuro.lines[0][1].cells)),
+                         [(6, 0), (7, 0), (0, 0)])
+
+    def test_solve_in_place(self):
+        for filename, is_torus in [('maps/mapKakuro2.txt', False),
+                                   ('maps/mapKakuro3.txt', False),
+                                   ('maps/mapKakuro7.txt', False),
+                                   ('maps/mapKakuroVar1.txt', False),
+                                   ('maps/mapKakuroTor4.txt', True)]:
+            outputs = []
+            for in_place in [False, True]:
+                kakuro_ = Kakuro(kakuro.load_data(filename), is_torus)
+                solver = Solver(10, in_place=in_place)
+                out = StringIO()
+                sys.stdout = out
+                solver.print_solutions(kakuro_, -1)
+                outputs.append(out.getvalue())
+            self.assertEqual(outputs[0], outputs[1])
+
+    def test_line_is_consistent(self):
+        input_ = ['[-] [13\\-] [7\\-]',
+                  '[-\\15] [*] [*]',
+                  '[-\\5] [*] [*]']
+        kakuro = Kakuro(input_, False)
+        line = kakuro.map_[1][1].hor_line
+        self.assertEqual(line.sum_, 15)
+        self.assertIs(kakuro.map_[1][2].hor_line, line)
+        Solver._set_value_to_cell(kakuro.map_, 1, 1, 5)
+        self.assertEqual(line.state, (5, 1, 1 << 5, False))
+        self.assertFalse(line.is_consistent(10))
+        Solver._set_value_to_cell(kakuro.map_, 1, 1, 7)
+        self.assertTrue(line.is_consistent(10))
+        Solver._set_value_to_cell(kakuro.map_, 2, 1, 7)
+        self.assertFalse(kakuro.map_[2][1].vert_line.is_consistent(10))
+        Solver._set_value_to_cell(kakuro.map_, 1, 2, 8)
+        self.assertEqual(line.state, (15, 2, (1 << 7) | (1 << 8), False))
+        self.assertTrue(line.is_consistent(10))
+
+    def test_propagate(self):
+        kakuro_ = Kakuro(kakuro.load_data('maps/mapKakuro2.txt'), False)
+        solver = Solver(10)
+        solver._set_single_possible_values(kakuro_.map_)
+        kakuro_.reset_lines()
+        lines = kakuro_.lines[0] + kakuro_.lines[1]
+        self.assertTrue(solver._propagate(lines, []))
+        self.assertEqual(Solver._find_next_empty_cell(kakuro_.map_),
+                         (-1, -1))
+        self.assertEqual(str(kakuro_.map_[4][2]), '[8]')
+        kakuro_ = Kakuro(kakuro.load_data('maps/mapKakuro_NoSolutions.txt'),
+                         False)
+        solver._set_single_possible_values(kakuro_.map_)
+        kakuro_.reset_lines()
+        lines = kakuro_.lines[0] + kakuro_.lines[1]
+        self.assertFalse(solver._propagate(lines, []))
+
+    def test_propagate_undo(self):
+        kakuro_ = Kakuro(kakuro.load_data('maps/mapKakuro3.txt'), False)
+        solver = Solver(10)
+        solver._set_single_possible_values(kakuro_.map_)
+        kakuro_.reset_lines()
+        self.assertTrue(solver._propagate(kakuro_.lines[0], []))
+        self.assertEqual(kakuro_.map_[2][2].possible_values, ['6', '7'])
+        trail = []
+        Solver._set_value_to_cell(kakuro_.map_, 1, 1, 1, trail)
+        self.assertTrue(solver._propagate(kakuro_.lines[1], trail))
+        self.assertEqual(str(kakuro_.map_[2][2]), '[6]')
+        Solver._undo(trail, 0)
+        self.assertEqual(str(kakuro_.map_[1][1]), '[*]')
+        self.assertEqual(str(kakuro_.map_[2][2]), '[*]')
+        self.assertEqual(kakuro_.map_[2][2].possible_values, ['6', '7'])
+
+    def test_heuristics(self):
+        expected_result = None
+        for heuristic in ['row', 'mrv', 'degree', 'tight']:
+            kakuro_ = Kakuro(kakuro.load_data('maps/mapKakuro7.txt'), False)
+            solver = Solver(10, heuristic=heuristic)
+            sys.stdout = StringIO()
+            solver.print_solutions(kakuro_, -1)
+            self.assertEqual(solver.count_results, 156)
+            if expected_result is None:
+                expected_result = sorted(solver.solutions)
+            self.assertEqual(sorted(solver.solutions), expected_result)
+        with self.assertRaises(ValueError):
+            Solver(10, heuristic='random')
+
+    def test_cell_queue(self):
+        input_ = ['[-] [4\\-] [13\\-]',
+                  '[-\\12] [*] [*]',
+                  '[-\\4] [*] [*]']
+        kakuro_ = Kakuro(input_, False)
+        Solver(10)._set_single_possible_values(kakuro_.map_)
+        cells = [kakuro_.map_[i][j] for i in [1, 2] for j in [1, 2]]
+        self.assertEqual(cells[0].possible_values, ['3'])
+        self.assertEqual(cells[2].possible_values, ['1', '3'])
+        self.assertEqual(cells[3].possible_values, [])
+        cells[0].value = '[3]'
+        queue = CellQueue(cells, 'mrv')
+        self.assertIs(queue.pop(), cells[3])
+        self.assertIs(queue.pop(), cells[2])
+        queue = CellQueue(cells, 'row')
+        self.assertIs(queue.pop(), cells[1])
+        self.assertIs(queue.pop(), cells[2])
+        cells[0].value = '[*]'
+        queue.push(cells[0])
+        self.assertIs(queue.pop(), cells[0])
+        queue = CellQueue(cells, 'mrv')
+        domain = cells[1].domain
+        for i in range(1000):
+            cells[1].domain = domain >> i % 3
+            queue.update(cells[1])
+            queue.push(cells[2])
+        self.assertLessEqual(len(queue.heap), 2 * 4 + QUEUE_SLACK)
+        cells[1].domain = domain
+        queue.update(cells[1])
+        expected = list(iter(CellQueue(cells, 'mrv').pop, None))
+        self.assertEqual(len(expected), 4)
+        self.assertEqual(list(iter(queue.pop, None)), expected)
+
+    def test_time_limit(self):
+        kakuro_ = Kakuro(kakuro.load_data('maps/mapKakuro7.txt'), False)
+        solver = Solver(10, time_limit=0)
+        self.assertEqual(solver.solve(kakuro_, -1), [])
+        self.assertTrue(solver.limit_exceeded)
+        self.assertEqual(str(kakuro_.map_[1][1]), '[*]')
+        solver.time_limit = None
+        self.assertEqual(len(solver.solve(kakuro_, -1)), 156)
+        self.assertFalse(solver.limit_exceeded)
+
+    def test_node_limit(self):
+        data = kakuro.load_data('maps/mapKakuro7.txt')
+        for engine in ['search', 'compact', 'dlx']:
+            solver = create_solver(engine, 10, node_limit=50)
+            solutions = solver.solve(Kakuro(list(data), False), -1)
+            self.assertTrue(solver.limit_exceeded)
+            self.assertEqual(solver.limit_reason, 'nodes')
+            self.assertLess(len(solutions), 156)
+            self.assertLess(solver.stats.nodes, 100)
+        solver.node_limit = None
+        self.assertEqual(len(solver.solve(Kakuro(list(data), False), -1)),
+                         156)
+        self.assertIsNone(solver.limit_reason)
+
+    def test_main_budget(self):
+        sys.argv[1:] = ['-n', '-1', '--count', '--max-nodes', '20',
+                        'maps/mapKakuro7.txt']
+        out = StringIO()
+        sys.stdout = out
+        sys.stderr = StringIO()
+        with self.assertRaises(SystemExit) as e:
+            kakuro.main()
+        self.assertEqual(e.exception.code, 11)
+        self.assertLess(int(out.getvalue()), 156)
+        self.assertIn('Budget exhausted (nodes)', sys.stderr.getvalue())
+        sys.argv[1:] = ['--timeout', '0', 'maps/mapKakuro7.txt']
+        with self.assertRaises(SystemExit) as e:
+            kakuro.main()
+        self.assertEqual(e.exception.code, 11)
+        sys.argv[1:] = ['--unique', '--max-nodes', '100000',
+                        'maps/mapKakuro_NoSolutions.txt']
+        out = StringIO()
+        sys.stdout = out
+        sys.stderr = StringIO()
+        with self.assertRaises(SystemExit) as e:
+            kakuro.main()
+        self.assertEqual(e.exception.code, 1)
+        self.assertEqual(out.getvalue(), '')
+        self.assertIn('No solutions', sys.stderr.getvalue())
+
+    def test_solve_base_36(self):
+        data = ['[-] [69\\-] [67\\-]',
+                '[-\\69] [*] [*]',
+                '[-\\67] [*] [*]']
+        kakuro_ = Kakuro(data, False)
+        self.assertEqual(str(kakuro_.map_[1][0]), '[-\\69]')
+        solutions = Solver(36).solve(kakuro_, -1)
+        self.assertEqual(len(solutions), 2)
+        self.assertIn('[y]', solutions[0])
+        self.assertIn('[z]', solutions[0])
+
+    def test_iter_solutions(self):
+        kakuro_ = Kakuro(kakuro.load_data('maps/mapKakuro7.txt'), False)
+        solver = Solver(10)
+        expected_result = solver.solve(kakuro_, -1)
+        solutions = solver.iter_solutions(kakuro_, -1)
+        solution = next(solutions)
+        self.assertEqual(solution[0][0], None)
+        self.assertEqual(solution[1][1:4], (3, 8, 9))
+        self.assertEqual(kakuro_.format_solution(solution), expected_result[0])
+        solutions.close()
+        self.assertEqual(str(kakuro_.map_[1][2]), '[*]')
+        actual_result = list(map(kakuro_.format_solution,
+                                 solver.iter_solutions(kakuro_, 5)))
+        self.assertEqual(actual_result, expected_result[:5])
+
+    def test_main_count(self):
+        sys.argv[1:] = ['-n', '-1', '--count', 'maps/mapKakuro7.txt']
+        out = StringIO()
+        sys.stdout = out
+        kakuro.main()
+        self.assertEqual(out.getvalue(), '156\n')
+
+    def test_count_solutions(self):
+        data = kakuro.load_data('maps/mapKakuro7.txt')
+        kakuro_ = Kakuro(list(data), False)
+        solver = Solver(10)
+        self.assertEqual(solver.count_solutions(kakuro_), 156)
+        self.assertEqual(solver.count_solutions(kakuro_, 2), 2)
+        self.assertEqual(str(kakuro_.map_[1][1]), '[*]')
+        kakuro_ = Kakuro(data + data + data, False)
+        self.assertEqual(solver.count_solutions(kakuro_), 156 ** 3)
+        kakuro_ = Kakuro(kakuro.load_data('maps/mapKakuro1.txt'), False)
+        self.assertEqual(solver.count_solutions(kakuro_, 2), 1)
+        kakuro_ = Kakuro(kakuro.load_data('maps/mapKakuro_NoSolutions.txt'),
+                         False)
+        self.assertEqual(solver.count_solutions(kakuro_), 0)
+
+    def test_main_unique(self):
+        sys.argv[1:] = ['--unique', 'maps/mapKakuro7.txt']
+        out = StringIO()
+        sys.stdout = out
+        kakuro.main()
+        sys.argv[1:] = ['--unique', 'maps/mapKakuro1.txt']
+        kakuro.main()
+        self.assertEqual(out.getvalue(), 'multiple\nunique\n')
+
+    def test_decompose(self):
+        data = kakuro.load_data('tests/test_cut_map.txt')
+        kakuro_ = Kakuro(list(data), False)
+        cells = [j for i in kakuro_.map_ for j in i if isinstance(j, Cell)]
+        actual_result = Solver._get_articulation_cells(cells)
+        self.assertEqual([(i.y, i.x) for i in actual_result], [(2, 3)])
+        self.assertEqual(len(Solver._get_components(cells)), 1)
+        expected_result = Solver(10, decompose=False).solve(kakuro_, -1)
+        actual_result = Solver(10).solve(kakuro_, -1)
+        self.assertEqual(len(actual_result), 10)
+        self.assertEqual(sorted(actual_result), sorted(expected_result))
+        data = kakuro.load_data('maps/mapKakuro7.txt')
+        kakuro_ = Kakuro(data + data, False)
+        cells = [j for i in kakuro_.map_ for j in i if isinstance(j, Cell)]
+        self.assertEqual(list(map(len, Solver._get_components(cells))),
+                         [9, 9])
+        actual_result = Solver(10).solve(kakuro_, 200)
+        self.assertEqual(len(set(actual_result)), 200)
+        self.assertEqual(str(kakuro_.map_[1][1]), '[*]')
+        solver = Solver(10)
+        next(solver.iter_solutions(kakuro_, -1))
+        self.assertEqual(solver.stats.nodes, 10)
+        solver = Solver(10)
+        actual_result = solver.solve(kakuro_, -1)
+        self.assertEqual(solver.stats.nodes, 518)
+        self.assertEqual(len(set(actual_result)), 156 * 156)
+
+    def test_search_stats(self):
+        data = kakuro.load_data('maps/mapKakuro7.txt')
+        events = []
+        solver = Solver(10, callback=lambda *x: events.append(x))
+        solutions = solver.solve(Kakuro(list(data), False), -1)
+        stats = solver.stats
+        self.assertEqual(stats.solutions, len(solutions))
+        self.assertEqual(sum(stats.depths.values()), stats.nodes)
+        self.assertEqual(sum(stats.values_tried.values()), stats.nodes)
+        self.assertEqual(len(events), stats.nodes + stats.solutions)
+        self.assertEqual(len([x for x in events if x[0] == 'backtrack']),
+                         stats.backtracks)
+        self.assertEqual(stats.check_lines_failures, stats.backtracks)
+        self.assertGreater(stats.check_lines_failures, 0)
+        self.assertIn('search', stats.phases)
+        self.assertIn('nodes: {0}'.format(stats.nodes), stats.format())
+        for engine in ['compact', 'dlx']:
+            solver = create_solver(engine, 10)
+            solver.solve(Kakuro(list(data), False), -1)
+            self.assertEqual(solver.stats.solutions, len(solutions))
+            self.assertGreater(solver.stats.nodes, 0)
+        solver.solve(Kakuro(list(data), False), 1)
+        self.assertEqual(solver.stats.solutions, 1)
+        solver = create_solver('compact', 10)
+        solver.solve(Kakuro(kakuro.load_data('maps/mapKakuro1.txt'), False))
+        self.assertGreater(solver.stats.check_lines_failures, 0)
+
+    def test_main_stats(self):
+        filename = os.path.join(tempfile.mkdtemp(), 'stats.json')
+        sys.argv[1:] = ['-n', '-1', '--count', '--stats-json', filename,
+                        'maps/mapKakuro7.txt']
+        sys.stdout = StringIO()
+        kakuro.main()
+        with open(filename) as f:
+            stats = json.load(f)
+        shutil.rmtree(os.path.dirname(filename))
+        self.assertEqual(stats['solutions'], 156)
+        self.assertEqual(sum(stats['depths'].values()), stats['nodes'])
+        self.assertEqual(set(stats['phases']), {'parse', 'prepare', 'search'})
+        sys.argv[1:] = ['-n', '-1', '-j', '2', '--stats-json', filename,
+                        'maps/mapKakuro7.txt']
+        os.mkdir(os.path.dirname(filename))
+        kakuro.main()
+        with open(filename) as f:
+            stats = json.load(f)
+        shutil.rmtree(os.path.dirname(filename))
+        self.assertEqual(stats['solutions'], 156)
+        self.assertGreater(stats['nodes'], 0)
+        self.assertEqual(sum(stats['depths'].values()), stats['nodes'])
+        self.assertIn('format', stats['phases'])
+
+    def test_split(self):
+        data = kakuro.load_data('maps/mapKakuro7.txt')
+        solver = Solver(10)
+        expected_result = list(solver.solve(Kakuro(list(data), False), -1))
+        prefixes = solver.split(Kakuro(list(data), False), 8)
+        self.assertGreaterEqual(len(prefixes), 8)
+        actual_result = []
+        for prefix in prefixes:
+            kakuro_ = Kakuro(list(data), False)
+            actual_result.extend(solver.solve(kakuro_, -1, prefix))
+        self.assertEqual(actual_result, expected_result)
+
+    def test_solve_parallel(self):
+        data = kakuro.load_data('maps/mapKakuro7.txt')
+        expected_result = Solver(10).solve(Kakuro(list(data), False), -1)
+        actual_result = kakuro_parallel.solve_parallel(data, False, 10,
+                                                       n=-1, jobs=2)
+        self.assertEqual(actual_result, expected_result)
+        actual_result = kakuro_parallel.solve_parallel(data, False, 10,
+                                                       n=3, jobs=2)
+        self.assertEqual(len(actual_result), 3)
+        self.assertEqual(len(set(actual_result)), 3)
+
+    def test_parallel_budget(self):
+        data = kakuro_generator.generate_puzzle(14, rng=random.Random(2),
+                                                density=0.95)
+        for time_limit, node_limit, reason in [(None, 1000, 'nodes'),
+                                               (0.2, None, 'time')]:
+            progress = {}
+            solutions = list(kakuro_parallel.iter_parallel(
+                data, False, 10, n=-1, jobs=2, time_limit=time_limit,
+                node_limit=node_limit, progress=progress))
+            self.assertEqual(progress['limit_reason'], reason)
+            self.assertEqual(len(set(solutions)), len(solutions))
+            if node_limit is not None:
+                self.assertGreaterEqual(progress['nodes'], node_limit)
+                self.assertLessEqual(progress['nodes'],
+                                     node_limit + 2 * NODE_BATCH)
+
     def test_check_lines(self):
         input_ = ['[-] [13\\-] [7\\-]',
                   '[-\\15] [*] [*]',
@@ -231,5 +847,370 @@ class SolverTest(unittest.TestCase):
         self.assertEqual(kakuro.check_lines(), True)
 
 
+class BatchTest(unittest.TestCase):
+    def test_split_puzzles(self):
+        lines = ['[*]\n', '\n', '\n', '[-] [*]\n', '[*] [*]', '']
+        actual_result = list(kakuro_batch.split_puzzles(lines))
+        self.assertEqual(actual_result, [['[*]'], ['[-] [*]', '[*] [*]']])
+
+    def test_find_files(self):
+        files = kakuro_batch.find_files('maps')
+        self.assertEqual(len(files), 13)
+        self.assertEqual(files[0], os.path.join('maps', 'mapKakuro1.txt'))
+        files = kakuro_batch.find_files('maps/mapKakuroTor*.txt')
+        self.assertEqual(len(files), 4)
+        self.assertEqual(kakuro_batch.find_files('tests/test_table.txt'),
+                         ['tests/test_table.txt'])
+
+    def test_solve_puzzle(self):
+        solver = Solver(10)
+        puzzles = list(kakuro_batch.iter_puzzles(
+            ['tests/test_batch_maps.txt']))
+        self.assertEqual([x[1] for x in puzzles], [1, 2, 3])
+        records = [kakuro_batch.solve_puzzle(solver, x[2], False)
+                   for x in puzzles]
+        self.assertEqual([x['status'] for x in records],
+                         ['solved', 'no_solutions', 'invalid'])
+        expected_result = '[-]     [13\\-]  [7\\-]\n[-\\15]  '
+        expected_result += '[9]     [6]\n[-\\5]   [4]     [1]'
+        self.assertEqual(records[0]['solutions'], [expected_result])
+
+    def test_main(self):
+        sys.argv[1:] = ['tests/test_batch_maps.txt', 'maps/mapKakuro3.txt']
+        out = StringIO()
+        sys.stdout = out
+        kakuro_batch.main()
+        records = out.getvalue().strip().split('\n')
+        self.assertEqual(len(records), 4)
+        self.assertIn('"status": "solved"', records[3])
+        sys.argv[1:] = ['nonexistentfile.txt']
+        sys.stderr = StringIO()
+        with self.assertRaises(SystemExit):
+            kakuro_batch.main()
+
+    def test_main_jobs(self):
+        sys.argv[1:] = ['-j', '2', '--timeout', '10',
+                        'tests/test_batch_maps.txt', 'maps/mapKakuro3.txt']
+        out = StringIO()
+        sys.stdout = out
+        kakuro_batch.main()
+        records = out.getvalue().strip().split('\n')
+        self.assertEqual(len(records), 4)
+        self.assertIn('"status": "invalid"', records[2])
+        self.assertIn('"file": "maps/mapKakuro3.txt"', records[3])
+
+    def test_main_max_nodes(self):
+        sys.argv[1:] = ['-n', '-1', '--max-nodes', '10',
+                        'maps/mapKakuro7.txt']
+        out = StringIO()
+        sys.stdout = out
+        kakuro_batch.main()
+        record = json.loads(out.getvalue())
+        self.assertEqual(record['status'], 'node_limit')
+        self.assertLess(record['count'], 156)
+
+
+class CompactKakuroTest(unittest.TestCase):
+    def test_create(self):
+        board = CompactKakuro.from_data(
+            kakuro.load_data('maps/mapKakuroVar1.txt'), False)
+        kakuro_ = Kakuro(kakuro.load_data('maps/mapKakuroVar1.txt'), False)
+        self.assertEqual(str(board), str(kakuro_))
+        cells = sum(map(lambda x: isinstance(x, Cell),
+                        itertools.chain(*kakuro_.map_)))
+        self.assertEqual(len(board.positions), cells)
+        self.assertEqual(len(board.run_sums),
+                         len(kakuro_.lines[0]) + len(kakuro_.lines[1]))
+        for cell in range(len(board.positions)):
+            for run in board.get_runs(cell):
+                self.assertIn(cell, board.get_run(run))
+
+    def test_copy(self):
+        board = CompactKakuro.from_data(
+            kakuro.load_data('maps/mapKakuro1.txt'), False)
+        board_copy = board.copy()
+        board_copy.values[0] = 1
+        self.assertEqual(board.values[0], 0)
+        self.assertIs(board_copy.run_cells, board.run_cells)
+        board_copy = pickle.loads(pickle.dumps(board))
+        self.assertEqual(str(board_copy), str(board))
+        self.assertEqual(board_copy.run_offsets, board.run_offsets)
+
+    def test_solve(self):
+        for filename, is_torus in [('maps/mapKakuro7.txt', False),
+                                   ('maps/mapKakuroTor4.txt', True),
+                                   ('maps/mapKakuro_NoSolutions.txt', False)]:
+            data = kakuro.load_data(filename)
+            board = CompactKakuro.from_data(data, is_torus)
+            actual_result = CompactSolver(10).solve(board, -1)
+            expected_result = Solver(10).solve(Kakuro(list(data), is_torus),
+                                               -1)
+            self.assertEqual(sorted(actual_result), sorted(expected_result))
+            self.assertEqual(str(board), str(Kakuro(list(data), is_torus)))
+        board = CompactKakuro.from_data(
+            kakuro.load_data('maps/mapKakuro7.txt'), False)
+        self.assertEqual(len(CompactSolver(10).solve(board, 3)), 3)
+
+    def test_solve_without_sums(self):
+        data = ['[-] [-] [-]',
+                '[-] [*] [*]']
+        for engine in ['search', 'compact', 'dlx']:
+            solver = create_solver(engine, 10)
+            self.assertEqual(solver.solve(Kakuro(data, False), -1), [])
+            self.assertEqual(solver.count_solutions(Kakuro(data, False)), 0)
+
+    def test_count_solutions(self):
+        kakuro_ = Kakuro(kakuro.load_data('maps/mapKakuro7.txt'), False)
+        for solver in [CompactSolver(10), ExactCoverSolver(10)]:
+            self.assertEqual(solver.count_solutions(kakuro_), 156)
+            self.assertEqual(solver.stats.solutions, 156)
+            self.assertEqual(solver.count_solutions(kakuro_, 2), 2)
+
+
+class ExactCoverTest(unittest.TestCase):
+    def test_dancing_links(self):
+        links = DancingLinks('ABCDEFG')
+        for row in ['CEF', 'ADG', 'BCF', 'AD', 'BG', 'DEG']:
+            links.add_row(row, row)
+        self.assertEqual(list(map(sorted, links.iter_covers())),
+                         [['AD', 'BG', 'CEF']])
+        links = DancingLinks('AB', 'C')
+        for row in ['AC', 'BC', 'A', 'B']:
+            links.add_row(row, row)
+        actual_result = sorted(map(sorted, links.iter_covers()))
+        self.assertEqual(actual_result, [['A', 'B'], ['A', 'BC'],
+                                         ['AC', 'B']])
+
+    def test_solve(self):
+        for filename, is_torus in [('maps/mapKakuro3.txt', False),
+                                   ('maps/mapKakuro7.txt', False),
+                                   ('maps/mapKakuroVar1.txt', False),
+                                   ('maps/mapKakuroTor4.txt', True),
+                                   ('maps/mapKakuro_NoSolutions.txt', False),
+                                   ('tests/test_cut_map.txt', False)]:
+            data = kakuro.load_data(filename)
+            kakuro_ = Kakuro(list(data), is_torus)
+            actual_result = ExactCoverSolver(10).solve(kakuro_, -1)
+            expected_result = Solver(10).solve(kakuro_, -1)
+            self.assertEqual(sorted(actual_result), sorted(expected_result))
+        self.assertEqual(len(ExactCoverSolver(10).solve(kakuro_, 3)), 3)
+        self.assertEqual(str(kakuro_.map_[1][1]), '[*]')
+
+    def test_create_solver(self):
+        self.assertIsInstance(create_solver('dlx', 10), ExactCoverSolver)
+        self.assertIsInstance(create_solver('compact', 10), CompactSolver)
+        with self.assertRaises(ValueError):
+            create_solver('undefined', 10)
+        sys.argv[1:] = ['--engine', 'dlx', '-n', '-1', '--count', '-j', '2',
+                        'maps/mapKakuro7.txt']
+        out = StringIO()
+        sys.stdout = out
+        kakuro.main()
+        self.assertEqual(out.getvalue(), '156\n')
+
+
+class BenchmarkTest(unittest.TestCase):
+    def test_run_case(self):
+        data = kakuro.load_data('maps/mapKakuro7.txt')
+        record = benchmark.run_case('map7', data, False, 10, 'search', -1)
+        self.assertEqual(record['status'], 'ok')
+        self.assertEqual(record['solutions'], 156)
+        self.assertEqual(record['cells'], 9)
+        self.assertGreater(record['nodes'], 0)
+        self.assertGreater(record['peak_memory'], 0)
+        record = benchmark.run_case('bad', ['[?]'], False, 10, 'dlx')
+        self.assertEqual(record['status'], 'invalid')
+
+    def test_main(self):
+        filename = os.path.join(tempfile.mkdtemp(), 'benchmark.json')
+        sys.argv[1:] = ['--sizes', '5', '--numSys', '10', '6', '-o', filename]
+        benchmark.main()
+        with open(filename) as f:
+            records = list(map(json.loads, f))
+        shutil.rmtree(os.path.dirname(filename))
+        maps = len(os.listdir('maps'))
+        self.assertEqual(len(records), 3 * (maps + 2))
+        self.assertEqual(records[-1]['numeral_system'], 6)
+        self.assertEqual(records[-1]['engine'], 'search')
+
+
+class GeneratorTest(unittest.TestCase):
+    def test_generate_puzzle(self):
+        for numeral_system in [4, 10, 16]:
+            rng = random.Random(numeral_system)
+            data = kakuro_generator.generate_puzzle(8, numeral_system, rng)
+            self.assertEqual(len(data), 8)
+            kakuro_ = Kakuro(list(data), False)
+            for line in kakuro_.lines[0] + kakuro_.lines[1]:
+                self.assertTrue(1 < len(line.cells) < numeral_system)
+                self.assertTrue(line.sum_)
+            solver = Solver(numeral_system)
+            self.assertEqual(len(solver.solve(kakuro_, 1)), 1)
+
+    def test_generate_unique(self):
+        for size, numeral_system, is_torus in [(8, 10, False), (8, 16, False),
+                                               (8, 10, True)]:
+            rng = random.Random(size)
+            data = kakuro_generator.generate_unique(size, numeral_system,
+                                                    is_torus=is_torus,
+                                                    rng=rng)
+            self.assertEqual(len(data), size)
+            kakuro_ = Kakuro(list(data), is_torus)
+            solver = Solver(numeral_system)
+            self.assertEqual(solver.count_solutions(kakuro_, 2), 1)
+
+    def test_layout(self):
+        rng = random.Random(0)
+        for is_torus in [False, True]:
+            is_cell = kakuro_generator.create_layout(10, 1, 4, is_torus, rng)
+            for y in range(10):
+                for x in range(10):
+                    for dy, dx in [(0, 1), (1, 0)]:
+                        run = kakuro_generator.get_line(is_cell, y, x, dy,
+                                                        dx, is_torus)
+                        self.assertTrue(not is_cell[y][x]
+                                        or 1 < len(run) <= 4)
+
+    def test_main(self):
+        filename = os.path.join(tempfile.mkdtemp(), 'puzzles.txt')
+        sys.argv[1:] = ['-c', '3', '--size', '6', '--seed', '1',
+                        '-o', filename]
+        kakuro_generator.main()
+        with open(filename) as f:
+            puzzles = list(kakuro_batch.split_puzzles(f))
+        shutil.rmtree(os.path.dirname(filename))
+        self.assertEqual(len(puzzles), 3)
+        for data in puzzles:
+            solver = Solver(10)
+            self.assertEqual(solver.count_solutions(Kakuro(data, False), 2),
+                             1)
+
+
+class ServerTest(unittest.TestCase):
+    def test_parse_request(self):
+        request = kakuro_server.parse_request(
+            '{"map": "[-] [3\\\\-]\\n[-\\\\3] [*]", "timeout": 5}', 2)
+        self.assertEqual(request['data'], ['[-] [3\\-]', '[-\\3] [*]'])
+        self.assertEqual(request['time_limit'], 2)
+        self.assertIsNone(request['node_limit'])
+        for line in ['[]', '{"map": 1}', '{"map": "[*]", "mode": "x"}',
+                     '{"map": "[*]", "n": "1"}', 'x']:
+            with self.assertRaises(ValueError):
+                kakuro_server.parse_request(line)
+
+    def test_serve(self):
+        data = '\n'.join(kakuro.load_data('maps/mapKakuro7.txt'))
+        requests = [{'id': 1, 'map': data, 'n': 2},
+                    {'map': data, 'mode': 'count', 'n': -1},
+                    {'map': data, 'mode': 'unique', 'engine': 'dlx'},
+                    {'map': data, 'n': -1, 'max_nodes': 10},
+                    {'map': '[x'}]
+        socket_path = os.path.join(tempfile.mkdtemp(), 'kakuro.sock')
+        executor = kakuro_server.create_executor(1, 10)
+
+        async def run():
+            server = await kakuro_server.start_server(executor, socket_path,
+                                                      max_requests=1)
+            async with server:
+                reader, writer = await asyncio.open_unix_connection(
+                    socket_path)
+                for request in requests:
+                    writer.write((json.dumps(request) + '\n').encode())
+                responses = []
+                for _ in requests:
+                    responses.append(json.loads(await reader.readline()))
+                writer.close()
+                return responses
+
+        try:
+            responses = asyncio.run(run())
+        finally:
+            executor.shutdown()
+            shutil.rmtree(os.path.dirname(socket_path))
+        self.assertEqual(responses[0]['id'], 1)
+        self.assertEqual(responses[0]['count'], 2)
+        self.assertEqual(responses[1]['count'], 156)
+        self.assertFalse(responses[2]['unique'])
+        self.assertEqual(responses[3]['status'], 'node_limit')
+        self.assertEqual(responses[4]['status'], 'invalid')
+
+
+class SolutionCacheTest(unittest.TestCase):
+    def test_get_key(self):
+        cache = SolutionCache()
+        data = kakuro.load_data('maps/mapKakuro2.txt')
+        transposed = ['[-] [-] [-] [12\\-] [9\\-]',
+                      '[-] [-] [20\\4] [*] [*]',
+                      '[-] [10\\24] [*] [*] [*]',
+                      '[-\\6] [*] [*] [*] [-]',
+                      '[-\\17] [*] [*] [-] [-]']
+        key, is_transposed = cache.get_key(Kakuro(list(data), False), 10)
+        spaced = list(map(lambda x: '  '.join(x.split()) + ' ', data))
+        self.assertEqual(cache.get_key(Kakuro(spaced, False), 10),
+                         (key, is_transposed))
+        self.assertEqual(cache.get_key(Kakuro(list(transposed), False), 10),
+                         (key, not is_transposed))
+        self.assertNotEqual(cache.get_key(Kakuro(list(data), True), 10)[0],
+                            key)
+        self.assertNotEqual(cache.get_key(Kakuro(list(data), False), 16)[0],
+                            key)
+        cache.transpose = False
+        self.assertNotEqual(
+            cache.get_key(Kakuro(list(transposed), False), 10),
+            cache.get_key(Kakuro(list(data), False), 10))
+
+    def test_solve(self):
+        cache_dir = tempfile.mkdtemp()
+        cache = SolutionCache(1, cache_dir)
+        data = kakuro.load_data('maps/mapKakuro7.txt')
+        solver = Solver(10)
+        solutions, cached = cache.solve(solver, Kakuro(list(data), False), 2)
+        self.assertFalse(cached)
+        self.assertEqual(cache.solve(solver, Kakuro(list(data), False), 1),
+                         (solutions[:1], True))
+        self.assertFalse(cache.solve(solver, Kakuro(list(data), False),
+                                     -1)[1])
+        self.assertEqual(len(cache.solve(solver, Kakuro(list(data), False),
+                                         -1)[0]), 156)
+        data_2 = kakuro.load_data('maps/mapKakuro2.txt')
+        cache.solve(solver, Kakuro(list(data_2), False), -1)
+        self.assertEqual(len(cache.entries), 1)
+        cache = SolutionCache(1, cache_dir)
+        solutions, cached = cache.solve(solver, Kakuro(list(data), False), -1)
+        shutil.rmtree(cache_dir)
+        self.assertTrue(cached)
+        self.assertEqual(len(solutions), 156)
+        self.assertEqual(cache.hits, 1)
+
+    def test_solve_puzzle(self):
+        data = kakuro.load_data('maps/mapKakuro1.txt')
+        solver = Solver(10)
+        cache = SolutionCache()
+        records = [kakuro_batch.solve_puzzle(solver, list(data), False, 1,
+                                             cache=cache) for _ in range(2)]
+        self.assertFalse(records[0]['cached'])
+        self.assertTrue(records[1]['cached'])
+        self.assertEqual(records[0]['solutions'], records[1]['solutions'])
+        self.assertEqual(records[0]['solutions'],
+                         Solver(10).solve(Kakuro(list(data), False), 1))
+
+    def test_main_count(self):
+        solutions_dir = os.path.join(cache_dir, 'solutions')
+        shutil.rmtree(solutions_dir, True)
+        for args, expected_result in [(['--count', '-n', '-1'], '156'),
+                                      (['--unique'], 'multiple')]:
+            sys.argv[1:] = ['--cache'] + args + ['maps/mapKakuro7.txt']
+            out = StringIO()
+            sys.stdout = out
+            kakuro.main()
+            self.assertEqual(out.getvalue().strip(), expected_result)
+            self.assertEqual(len(os.listdir(solutions_dir)), 1)
+        sys.argv[1:] = ['--cache', '-j', '2', 'maps/mapKakuro7.txt']
+        sys.stderr = StringIO()
+        with self.assertRaises(SystemExit) as e:
+            kakuro.main()
+        self.assertEqual(e.exception.code, 2)
+
+
 if __name__ == '__main__':
     unittest.main()